@@ -0,0 +1,57 @@
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from fastapi.encoders import jsonable_encoder
+import fast_response
+from fast_response import encode_json, compress_body
+
+# Compares FastAPI's default response path (jsonable_encoder + json.dumps) with the
+# opt-in fast path (orjson, gzip/brotli) on payloads shaped like /history/code and /analytics/heatmap.
+
+def code_history_payload():
+    now = datetime.now(timezone.utc)
+    evaluation = json.dumps({
+        "correctness": "The solution handles the base cases but misses duplicate values. " * 12,
+        "time_complexity": "O(n^2) due to the nested loop over the input array.",
+        "space_complexity": "O(1) auxiliary space.",
+        "edge_cases": ["empty array", "single element", "negative numbers", "duplicates"] * 3,
+        "improvements": ["Use a hash map to store complements for O(n) lookup."] * 6,
+        "scores": {"logic": 7, "optimization": 5, "code_quality": 6},
+        "roadmap": "Review hashing patterns, then practise two-pointer problems. " * 10,
+    }, indent=2)
+    code = "def two_sum(nums, target):\n    for i in range(len(nums)):\n        for j in range(i + 1, len(nums)):\n            if nums[i] + nums[j] == target:\n                return [i, j]\n" * 4
+    return [{
+        "id": str(uuid.uuid4()), "userId": "default", "score": 7, "code": code, "language": "Python",
+        "problem": "Two Sum", "evaluation": evaluation, "timestamp": (now - timedelta(hours=i)).isoformat(),
+    } for i in range(50)]
+
+def heatmap_payload():
+    today = datetime.now(timezone.utc).date()
+    return {
+        "totalSubmissions": 1200, "activeDays": 365, "currentStreak": 12, "maxStreak": 40,
+        "dailyActivity": [{"date": (today - timedelta(days=i)).isoformat(), "count": i % 7 + 1} for i in range(365)],
+    }
+
+def default_path(content) -> bytes:
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def timed(fn, content, runs=200):
+    start = time.perf_counter()
+    for _ in range(runs):
+        body = fn(content)
+    return (time.perf_counter() - start) / runs * 1000, body
+
+print(f"orjson: {'yes' if fast_response.orjson else 'no (json fallback)'}  brotli: {'yes' if fast_response.brotli else 'no'}\n")
+for name, content in [("/history/code", code_history_payload()), ("/analytics/heatmap", heatmap_payload())]:
+    before_ms, before = timed(default_path, content)
+    after_ms, after = timed(encode_json, content)
+    gz_ms, gz = timed(lambda c: compress_body(encode_json(c), "gzip"), content, runs=50)
+    print(f"{name}")
+    print(f"  default  encoder+json : {before_ms:7.3f} ms  {len(before):>8} bytes")
+    print(f"  fast     serialize    : {after_ms:7.3f} ms  {len(after):>8} bytes")
+    print(f"  fast     + gzip       : {gz_ms:7.3f} ms  {len(gz):>8} bytes")
+    if fast_response.brotli:
+        br_ms, br = timed(lambda c: compress_body(encode_json(c), "br"), content, runs=50)
+        print(f"  fast     + brotli     : {br_ms:7.3f} ms  {len(br):>8} bytes")
+    print()
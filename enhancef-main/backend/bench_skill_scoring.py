@@ -0,0 +1,48 @@
+import time
+import bson
+import numpy as np
+from skill_scoring import MODULES, HISTORY_WINDOW, ScoreHistory, score_histories, topic_key
+
+# Micro-benchmark: cost per user of turning a stored `score_history` document into scores,
+# for users with thousands of attempts. Documents are BSON-encoded as MongoDB would return them,
+# so decode and ScoreHistory construction are timed along with the scoring itself.
+USERS = 500
+ATTEMPTS = 3000
+TOPICS = ["Quantitative", "Logical", "Verbal", "Data Interpretation", "Puzzles"]
+
+rng = np.random.default_rng(42)
+raw = []
+for i in range(USERS):
+    doc = {"userId": f"user-{i}", "schema": 2}
+    for m in MODULES:
+        scores = rng.uniform(0, 100, ATTEMPTS)
+        timestamps = np.sort(rng.integers(1_700_000_000, 1_760_000_000, ATTEMPTS))
+        doc[m] = {"scores": scores[-HISTORY_WINDOW:].tolist(), "ts": timestamps[-HISTORY_WINDOW:].tolist(), "count": ATTEMPTS}
+        if m == "aptitude":
+            topics = rng.integers(0, len(TOPICS), ATTEMPTS)
+            doc[m]["topicSums"] = {topic_key(t): float(scores[topics == j].sum()) for j, t in enumerate(TOPICS)}
+            doc[m]["topicCounts"] = {topic_key(t): int((topics == j).sum()) for j, t in enumerate(TOPICS)}
+    raw.append(bson.encode(doc))
+
+print(f"{USERS} users x {ATTEMPTS} attempts per module, {sum(map(len, raw)) / USERS / 1024:.1f} KiB stored per user")
+
+score_histories([ScoreHistory.from_document(bson.decode(b)) for b in raw[:10]])  # warm-up
+
+runs = 5
+start = time.perf_counter()
+for _ in range(runs):
+    histories = [ScoreHistory.from_document(bson.decode(b)) for b in raw]
+loaded = (time.perf_counter() - start) / runs
+start = time.perf_counter()
+for _ in range(runs):
+    score_histories(histories)
+scored = (time.perf_counter() - start) / runs
+
+print(f"Decode + build: {loaded * 1000:.1f} ms  |  per user: {loaded / USERS * 1000:.3f} ms")
+print(f"Batch scoring:  {scored * 1000:.1f} ms  |  per user: {scored / USERS * 1000:.3f} ms")
+
+start = time.perf_counter()
+for b in raw[:100]:
+    score_histories([ScoreHistory.from_document(bson.decode(b))])
+single = (time.perf_counter() - start) / 100
+print(f"Single-user load + score: {single * 1000:.3f} ms")
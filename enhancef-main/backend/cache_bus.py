@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# "auto": change streams, falling back to polling on standalone Mongo. "poll": polling only.
+# "off": no per-user caching at all (every read goes to Mongo).
+CACHE_BUS_MODE = os.environ.get('CACHE_BUS_MODE', 'auto')
+CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '300'))
+CACHE_MAX_USERS = int(os.environ.get('USER_CACHE_MAX_USERS', '5000'))
+POLL_INTERVAL = float(os.environ.get('CACHE_BUS_POLL_INTERVAL', '1'))
+# Polls re-read this much history: updatedAt comes from the Mongo server's clock (which may be skewed
+# against ours) at millisecond resolution, so a strict "newer than last seen" cut-off can miss bumps
+POLL_OVERLAP = float(os.environ.get('CACHE_BUS_POLL_OVERLAP', '10'))
+RESUME_TOKEN_SAVE_INTERVAL = 5.0
+
+CHANGE_STREAM_UNSUPPORTED = 40573  # $changeStream is only supported on replica sets
+CHANGE_STREAM_HISTORY_LOST = 286   # stored resume token has rolled off the oplog
+
+
+class UserCache:
+    """Per-user cache of computed read payloads (and the user's data version), LRU-bounded by user
+    and TTL-bounded per entry so anything the bus misses still ages out."""
+
+    def __init__(self, enabled: bool = True, ttl: float = CACHE_TTL, max_users: int = CACHE_MAX_USERS):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_users = max_users
+        self.users = OrderedDict()  # {user_id: {key: (expires_at, value)}}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str, key):
+        entry = self.users.get(user_id, {}).get(key) if self.enabled else None
+        if entry is None or entry[0] < time.monotonic():
+            self.misses += 1
+            return None
+        self.users.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, user_id: str, key, value):
+        if not self.enabled:
+            return
+        self.users.setdefault(user_id, {})[key] = (time.monotonic() + self.ttl, value)
+        self.users.move_to_end(user_id)
+        while len(self.users) > self.max_users:
+            self.users.popitem(last=False)
+
+    def evict(self, user_id: str):
+        self.users.pop(user_id, None)
+
+    def clear(self):
+        self.users.clear()
+
+
+class InvalidationBus:
+    """One background task per worker that evicts per-user cache entries when another worker writes.
+
+    Every write path ends by bumping the user's `user_versions` document, so that bump is the
+    only signal watched: evicting on an earlier write (an activity insert) would let a concurrent
+    read re-cache the old version. Tails a change stream on `user_versions`, persisting the resume
+    token so a restarted worker picks up where it left off; on standalone Mongo (no replica set)
+    or if the stream cannot be opened it polls the same collection instead. If even polling dies,
+    caching is switched off rather than left running without invalidation."""
+
+    def __init__(self, db, cache: UserCache, mode: str = CACHE_BUS_MODE, state_id: str = "invalidation_bus"):
+        self.db = db
+        self.cache = cache
+        self.mode = mode
+        self.state_id = state_id
+        self.active_mode = None
+        self.events = 0
+        self.last_lag = None
+        self.max_lag = 0.0
+        self._lag_total = 0.0
+
+    def _observe(self, user_id, event_time: datetime = None):
+        if user_id is None:
+            self.cache.clear()  # e.g. a delete without the document: drop everything rather than serve stale
+        else:
+            self.cache.evict(user_id)
+        self.events += 1
+        if event_time is not None:
+            lag = max(0.0, (datetime.now(timezone.utc) - event_time).total_seconds())
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self._lag_total += lag
+
+    async def run(self):
+        if self.mode == "off":
+            return
+        if self.mode == "auto":
+            try:
+                await self._watch()
+                return
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    logger.info("Change streams unavailable (standalone Mongo); cache bus falling back to polling")
+                else:
+                    logger.error(f"Cache bus change stream failed: {e!r}; falling back to polling")
+            except Exception as e:
+                logger.error(f"Cache bus change stream failed: {e!r}; falling back to polling")
+            self.cache.clear()  # events may have been missed while the stream was down
+        try:
+            await self._poll()
+        except Exception as e:
+            logger.error(f"Cache bus polling failed: {e!r}; disabling the per-user cache")
+            self.cache.enabled = False
+            self.cache.clear()
+            self.active_mode = "off"
+
+    async def _load_resume_token(self):
+        state = await self.db.cache_bus_state.find_one({"_id": self.state_id})
+        return (state or {}).get("resumeToken")
+
+    async def _save_resume_token(self, token):
+        await self.db.cache_bus_state.update_one({"_id": self.state_id}, {"$set": {"resumeToken": token}}, upsert=True)
+
+    async def _clear_resume_token(self):
+        await self.db.cache_bus_state.delete_one({"_id": self.state_id})
+
+    async def _watch(self):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        resume_token = await self._load_resume_token()
+        while True:
+            try:
+                async with self.db.user_versions.watch(pipeline, full_document="updateLookup", resume_after=resume_token) as stream:
+                    self.active_mode = "change_stream"
+                    last_saved = time.monotonic()
+                    async for change in stream:
+                        doc = change.get("fullDocument") or {}
+                        user_id = doc.get("userId")
+                        cluster_time = change.get("clusterTime")
+                        event_time = datetime.fromtimestamp(cluster_time.time, timezone.utc) if cluster_time else None
+                        self._observe(user_id, event_time)
+                        resume_token = stream.resume_token
+                        if time.monotonic() - last_saved >= RESUME_TOKEN_SAVE_INTERVAL:
+                            await self._save_resume_token(resume_token)
+                            last_saved = time.monotonic()
+            except OperationFailure as e:
+                if e.code != CHANGE_STREAM_HISTORY_LOST:
+                    raise
+                # Too far behind to resume: start a fresh stream and drop everything cached meanwhile
+                logger.warning("Cache bus resume token is no longer in the oplog; restarting the change stream")
+                self.cache.clear()
+                resume_token = None
+                await self._clear_resume_token()
+            except PyMongoError as e:
+                # Transient network / election errors: drop cached data (we may have missed events) and resume
+                logger.warning(f"Cache bus change stream interrupted: {e!r}; resuming")
+                self.cache.clear()
+                if resume_token is not None:
+                    await self._save_resume_token(resume_token)
+                await asyncio.sleep(1)
+
+    async def _poll(self):
+        self.active_mode = "poll"
+        overlap = timedelta(seconds=POLL_OVERLAP)
+        since = datetime.now(timezone.utc)
+        seen = {}  # {userId: (version, updatedAt)} already observed inside the overlap window
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            try:
+                cutoff = since - overlap
+                query = {"updatedAt": {"$gte": cutoff}}
+                async for doc in self.db.user_versions.find(query, {"_id": 0}).sort("updatedAt", 1):
+                    updated = doc["updatedAt"]
+                    if updated.tzinfo is None:
+                        updated = updated.replace(tzinfo=timezone.utc)
+                    since = max(since, updated)
+                    if seen.get(doc["userId"], (None,))[0] == doc.get("version"):
+                        continue
+                    seen[doc["userId"]] = (doc.get("version"), updated)
+                    self._observe(doc["userId"], updated)
+                seen = {u: v for u, v in seen.items() if v[1] >= cutoff}
+            except PyMongoError as e:
+                logger.warning(f"Cache bus poll failed: {e!r}")
+                self.cache.clear()
+
+    def snapshot(self) -> dict:
+        return {
+            "mode": self.active_mode or self.mode,
+            "events": self.events,
+            "lastLagSeconds": round(self.last_lag, 3) if self.last_lag is not None else None,
+            "avgLagSeconds": round(self._lag_total / self.events, 3) if self.events else None,
+            "maxLagSeconds": round(self.max_lag, 3),
+            "cachedUsers": len(self.cache.users),
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+        }
@@ -0,0 +1,2 @@
+# test_gemini.py is a manual API smoke script that exits at import without GEMINI_API_KEY
+collect_ignore = ["test_gemini.py"]
@@ -0,0 +1,35 @@
+# CPU-bound helpers used by async handlers. They run in the process pool (executors.py), whose
+# workers import this module by name, so keep its imports light: no server, cv2 or database.
+import hashlib
+import json
+import re
+
+from executors import offload, OFFLOAD_MIN_CHARS
+from prompt_budget import compact_code, strip_comments
+
+_FENCED = re.compile(r'```(?:json)?\s*\n?([\s\S]*?)\n?```', re.IGNORECASE)
+
+
+@offload("cpu", inline_below=OFFLOAD_MIN_CHARS)
+def extract_json(text: str) -> dict:
+    match = _FENCED.search(text)
+    if match: text = match.group(1)
+    # Outermost {...}: same span as a greedy r'\{[\s\S]*\}' search, without its quadratic backtracking
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start: text = text[start:end + 1]
+    try: return json.loads(text)
+    except ValueError: return {}
+
+
+@offload("cpu", inline_below=OFFLOAD_MIN_CHARS)
+def compact_prompt_code(code: str, language: str, budget: int, model: str, factor: float, lossy: bool = True) -> str:
+    # `factor` is the caller's learned token calibration: pool workers have none of their own
+    return compact_code(code, language, budget, model, lossy=lossy, factor=factor)
+
+
+@offload("cpu", inline_below=OFFLOAD_MIN_CHARS)
+def code_fingerprint(code: str, language: str) -> str:
+    """Hash of the code with comments, blank lines and trailing whitespace normalized away."""
+    lines = (line.rstrip() for line in strip_comments(code, language).splitlines())
+    normalized = "\n".join(line for line in lines if line)
+    return hashlib.sha256(normalized.encode()).hexdigest()
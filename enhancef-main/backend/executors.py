@@ -0,0 +1,180 @@
+import asyncio
+import functools
+import importlib
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+
+def _available_cores() -> int:
+    # Respect container / taskset CPU limits where the platform exposes them
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+CORES = _available_cores()
+CPU_WORKERS = int(os.environ.get('EXECUTOR_CPU_WORKERS', str(CORES)))
+IO_WORKERS = int(os.environ.get('EXECUTOR_IO_WORKERS', str(min(32, CORES + 4))))
+# Inputs shorter than this are processed inline: shipping them to a worker process costs more than the work
+OFFLOAD_MIN_CHARS = int(os.environ.get('OFFLOAD_MIN_CHARS', str(16 * 1024)))
+LOOP_LAG_THRESHOLD_MS = float(os.environ.get('LOOP_LAG_THRESHOLD_MS', '100'))
+LOOP_LAG_INTERVAL = 0.05
+
+
+def _invoke(module: str, qualname: str, args: tuple, kwargs: dict):
+    """Process-pool entry point: resolve the undecorated function by name in the worker."""
+    target = importlib.import_module(module)
+    for part in qualname.split("."):
+        target = getattr(target, part)
+    target = getattr(target, "__wrapped__", target)
+    return target(*args, **kwargs)
+
+
+class Executors:
+    """Process pool for CPU-bound helpers, thread pool for blocking I/O. Both are created lazily;
+    the process pool uses "spawn" so workers never inherit the event loop, Motor client or sockets."""
+
+    def __init__(self, cpu_workers: int = CPU_WORKERS, io_workers: int = IO_WORKERS):
+        self.cpu_workers = cpu_workers
+        self.io_workers = io_workers
+        self._cpu = None
+        self._io = None
+        self.calls = defaultdict(lambda: {"offloaded": 0, "inline": 0, "totalMs": 0.0})
+
+    @property
+    def cpu(self) -> ProcessPoolExecutor:
+        if self._cpu is None:
+            self._cpu = ProcessPoolExecutor(self.cpu_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._cpu
+
+    @property
+    def io(self) -> ThreadPoolExecutor:
+        if self._io is None:
+            self._io = ThreadPoolExecutor(self.io_workers, thread_name_prefix="io")
+        return self._io
+
+    async def run_cpu(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.cpu, _invoke, fn.__module__, fn.__qualname__, args, kwargs)
+        except BrokenProcessPool:
+            # A worker died (OOM, signal): replace the pool and serve this call from a thread
+            logger.error("Process pool broken; recreating it")
+            self._cpu = None
+            return await self.run_io(fn, *args, **kwargs)
+
+    async def run_io(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io, functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self):
+        for pool in (self._cpu, self._io):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._cpu = self._io = None
+
+    def snapshot(self) -> dict:
+        return {
+            "cpuWorkers": self.cpu_workers,
+            "ioWorkers": self.io_workers,
+            "calls": {
+                name: {**c, "avgMs": round(c["totalMs"] / max(1, c["offloaded"] + c["inline"]), 2), "totalMs": round(c["totalMs"], 1)}
+                for name, c in self.calls.items()
+            },
+        }
+
+
+executors = Executors()
+
+
+def offload(pool: str = "cpu", inline_below: int = 0):
+    """Turn a blocking helper into a coroutine that runs on the given pool ("cpu" or "io").
+
+    CPU helpers must live at module level in a module that is cheap to import, since process
+    workers resolve them by name. With `inline_below`, calls whose first argument is shorter
+    than that many characters run inline instead. The plain function stays at `.__wrapped__`."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            stats = executors.calls[fn.__qualname__]
+            start = time.perf_counter()
+            try:
+                if inline_below and args and len(args[0] or "") < inline_below:
+                    stats["inline"] += 1
+                    return fn(*args, **kwargs)
+                stats["offloaded"] += 1
+                if pool == "cpu":
+                    return await executors.run_cpu(fn, *args, **kwargs)
+                return await executors.run_io(fn, *args, **kwargs)
+            finally:
+                stats["totalMs"] += (time.perf_counter() - start) * 1000
+        return wrapper
+    return decorator
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag with a heartbeat task. A watchdog thread logs the loop thread's
+    stack while it is blocked past the threshold, so the offending callback is named in the log."""
+
+    def __init__(self, threshold_ms: float = LOOP_LAG_THRESHOLD_MS, interval: float = LOOP_LAG_INTERVAL):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self.samples = 0
+        self.blocked = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._lag_total = 0.0
+        self._beat = time.monotonic()
+        self._reported_beat = None
+        self._loop_thread = None
+        self._stop = threading.Event()
+
+    async def run(self):
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        threading.Thread(target=self._watchdog, name="loop-lag-watchdog", daemon=True).start()
+        try:
+            while True:
+                self._beat = time.monotonic()
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, time.monotonic() - self._beat - self.interval)
+                self.samples += 1
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                self._lag_total += lag
+                if lag > self.threshold:
+                    self.blocked += 1
+                    logger.warning(f"Event loop was blocked for {lag * 1000:.0f} ms")
+        finally:
+            self._stop.set()
+
+    def _watchdog(self):
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            if time.monotonic() - beat - self.interval <= self.threshold or self._reported_beat == beat:
+                continue
+            self._reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                stack = "".join(traceback.format_stack(frame)[-8:])
+                logger.warning(f"Event loop blocked for over {self.threshold * 1000:.0f} ms in:\n{stack}")
+
+    def snapshot(self) -> dict:
+        return {
+            "thresholdMs": self.threshold * 1000,
+            "samples": self.samples,
+            "blocked": self.blocked,
+            "lastLagMs": round(self.last_lag * 1000, 1),
+            "avgLagMs": round(self._lag_total / self.samples * 1000, 2) if self.samples else None,
+            "maxLagMs": round(self.max_lag * 1000, 1),
+        }
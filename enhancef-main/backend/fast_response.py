@@ -0,0 +1,69 @@
+import gzip
+import json
+import os
+from fastapi import Request, Response
+
+# Optional speedups: orjson for serialization, brotli for compression. Both fall back cleanly.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Opt-in: when disabled, routes return their content through FastAPI's default jsonable_encoder path.
+FAST_JSON_RESPONSES = os.environ.get('FAST_JSON_RESPONSES', 'false').lower() == 'true'
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+
+
+def encode_json(content) -> bytes:
+    """Serialize plain data (dicts/lists straight out of Motor with `_id` projected away)."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def negotiate_encoding(accept_encoding: str):
+    """Pick "br" or "gzip" from an Accept-Encoding header, honouring q=0. None if neither is acceptable."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def fast_json(request: Request, content, response: Response = None):
+    """Return `content` as a pre-serialized (and, above COMPRESS_MIN_BYTES, compressed) JSON response.
+    Headers already set on an injected `response` (ETag, Cache-Control) are carried over."""
+    if not FAST_JSON_RESPONSES:
+        return content
+    body = encode_json(content)
+    headers = dict(response.headers) if response is not None else {}
+    headers["Vary"] = "Accept-Encoding"
+    if len(body) >= COMPRESS_MIN_BYTES:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        if encoding:
+            body = compress_body(body, encoding)
+            headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+STRONG_MODEL = os.environ.get('LLM_STRONG_MODEL', 'gemini-2.5-flash')
+LIGHT_MODEL = os.environ.get('LLM_LIGHT_MODEL', 'gemini-2.5-flash-lite')
+
+# Preferred model first; the rest are hedge / failover alternates, in order.
+TASK_MODELS = {
+    "code_evaluation": [STRONG_MODEL, LIGHT_MODEL],
+    "code_execution": [STRONG_MODEL, LIGHT_MODEL],
+    "chat": [STRONG_MODEL, LIGHT_MODEL],
+    "quiz": [STRONG_MODEL, LIGHT_MODEL],
+    "quiz_analysis": [LIGHT_MODEL, STRONG_MODEL],
+    "interview_evaluation": [STRONG_MODEL, LIGHT_MODEL],
+    "interview_questions": [LIGHT_MODEL, STRONG_MODEL],
+    "communication_tips": [LIGHT_MODEL, STRONG_MODEL],
+}
+
+STATS_WINDOW = int(os.environ.get('LLM_STATS_WINDOW', '100'))
+MIN_SAMPLES = 10               # below this, p95 and error rate are not trusted
+DEFAULT_HEDGE_DELAY = float(os.environ.get('LLM_HEDGE_DELAY', '8'))
+MIN_HEDGE_DELAY = 0.5
+MAX_ERROR_RATE = 0.5           # a preferred model above this error rate is demoted
+REQUEST_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', '60'))
+
+
+class ModelStats:
+    """Rolling latency and error window for one model."""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # True = error
+
+    def record(self, latency: float, error: bool):
+        if not error:
+            self.latencies.append(latency)
+        self.outcomes.append(error)
+
+    def p95(self):
+        if len(self.latencies) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def error_rate(self) -> float:
+        if len(self.outcomes) < MIN_SAMPLES:
+            return 0.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self) -> dict:
+        p95 = self.p95()
+        return {
+            "samples": len(self.outcomes),
+            "p95": round(p95, 3) if p95 is not None else None,
+            "errorRate": round(self.error_rate(), 3),
+        }
+
+
+class ModelRouter:
+    """Routes a task to a model, hedging to an alternate once the primary is slower than its p95.
+
+    `provider` is an async callable (model, system_msg, user_msg) -> str, so tests can inject
+    fake providers with controlled latency and failures."""
+
+    def __init__(self, provider, task_models: dict = None, clock=time.monotonic):
+        self.provider = provider
+        self.task_models = task_models or TASK_MODELS
+        self.stats = {}
+        self.clock = clock
+
+    def _stats(self, model: str) -> ModelStats:
+        if model not in self.stats:
+            self.stats[model] = ModelStats()
+        return self.stats[model]
+
+    def candidates(self, task: str) -> list:
+        models = list(dict.fromkeys(self.task_models.get(task) or self.task_models["chat"]))
+        # Demote models whose recent error rate is too high, keeping relative order otherwise
+        return sorted(models, key=lambda m: self._stats(m).error_rate() > MAX_ERROR_RATE)
+
+    def hedge_delay(self, model: str) -> float:
+        p95 = self._stats(model).p95()
+        return DEFAULT_HEDGE_DELAY if p95 is None else max(MIN_HEDGE_DELAY, p95)
+
+    async def _timed_call(self, model: str, system_msg: str, user_msg: str) -> str:
+        start = self.clock()
+        try:
+            result = await self.provider(model, system_msg, user_msg)
+        except asyncio.CancelledError:
+            raise  # losing hedge: not a latency sample
+        except Exception:
+            self._stats(model).record(self.clock() - start, error=True)
+            raise
+        self._stats(model).record(self.clock() - start, error=False)
+        return result
+
+    async def generate(self, task: str, system_msg: str, user_msg: str) -> str:
+        return await asyncio.wait_for(self._hedged(task, system_msg, user_msg), timeout=REQUEST_TIMEOUT)
+
+    async def _hedged(self, task: str, system_msg: str, user_msg: str) -> str:
+        models = self.candidates(task)
+        pending = {}  # {asyncio.Task: model}
+        next_index = 0
+        last_error = None
+
+        def launch():
+            nonlocal next_index
+            model = models[next_index]
+            next_index += 1
+            pending[asyncio.ensure_future(self._timed_call(model, system_msg, user_msg))] = model
+            return model
+
+        primary = launch()
+        try:
+            while pending:
+                can_hedge = next_index < len(models)
+                timeout = self.hedge_delay(primary) if can_hedge and len(pending) == 1 else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedge = launch()
+                    logger.info(f"Hedging {task}: {primary} slower than {timeout:.2f}s, also trying {hedge}")
+                    continue
+                for task_done in sorted(done, key=lambda t: t.exception() is not None):
+                    model = pending.pop(task_done)
+                    if task_done.exception() is None:
+                        return task_done.result()
+                    last_error = task_done.exception()
+                    logger.warning(f"Model {model} failed for {task}: {last_error}")
+                if not pending and next_index < len(models):
+                    primary = launch()  # failover
+            raise last_error
+        finally:
+            for loser in pending:
+                loser.cancel()
+
+    def snapshot(self) -> dict:
+        return {model: stats.snapshot() for model, stats in self.stats.items()}
@@ -0,0 +1,299 @@
+import os
+import re
+import json
+from collections import defaultdict
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # optional: exact counts for gpt-family models only
+    tiktoken = None
+
+# ---------- Request body limits (ASGI) ----------
+
+MAX_BODY_BYTES = int(os.environ.get('MAX_BODY_BYTES', str(256 * 1024)))
+
+
+class BodySizeLimitMiddleware:
+    """Rejects oversized request bodies with 413 while they stream in, before FastAPI buffers
+    and parses them. A declared Content-Length over the limit is rejected without reading."""
+
+    def __init__(self, app, max_bytes: int = MAX_BODY_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        declared = headers.get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            return await self._reject(send)
+
+        received = 0
+        response_started = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Answer now and make the app see a disconnected client; its own response is dropped
+                    rejected = True
+                    if not response_started:
+                        await self._reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": f"Request body exceeds {self.max_bytes} bytes"}).encode()
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+
+# ---------- Token estimation ----------
+
+# Approximate characters per token by model family as (prose, code): code tokenizes denser
+# (short identifiers, operators, indentation). Matched by longest prefix of the model name.
+# Unknown families get the conservative end, since over-estimating is the safe side of a budget.
+CHARS_PER_TOKEN = {
+    "gemini": (4.0, 3.2),    # SentencePiece, ~4 chars/token on English per Google's guidance
+    "gpt-4o": (4.4, 3.5),    # o200k_base
+    "gpt": (4.0, 3.1),       # cl100k_base
+    "claude": (3.6, 3.0),
+    "default": (3.5, 2.8),
+}
+
+CODE_TOKEN_BUDGET = int(os.environ.get('CODE_TOKEN_BUDGET', '6000'))
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.environ.get('CHAT_CONTEXT_TOKEN_BUDGET', '4000'))
+
+
+def model_family(model: str) -> str:
+    matches = [f for f in CHARS_PER_TOKEN if f != "default" and model.startswith(f)]
+    return max(matches, key=len) if matches else "default"
+
+
+@lru_cache(maxsize=16)
+def _tiktoken_encoding(model: str):
+    if tiktoken is None or not model.startswith("gpt"):
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None  # e.g. BPE files not cached and no network: fall back to the ratio
+
+
+class TokenCalibration:
+    """Per-model correction of the ratio estimate, learned (EWMA) from the prompt token counts
+    the provider reports back, so estimates converge on the real tokenizer over time."""
+
+    def __init__(self, alpha: float = 0.1, bounds=(0.5, 2.0)):
+        self.alpha = alpha
+        self.bounds = bounds
+        self.factors = {}
+
+    def observe(self, model: str, text: str, actual_tokens: int):
+        estimated = _ratio_estimate(text, model, code=False)
+        if not estimated or not actual_tokens:
+            return
+        sample = min(max(actual_tokens / estimated, self.bounds[0]), self.bounds[1])
+        previous = self.factors.get(model)
+        self.factors[model] = sample if previous is None else previous + self.alpha * (sample - previous)
+
+    def factor(self, model: str) -> float:
+        return self.factors.get(model, 1.0)
+
+    def snapshot(self) -> dict:
+        return {model: round(f, 3) for model, f in self.factors.items()}
+
+
+token_calibration = TokenCalibration()
+
+
+def _ratio_estimate(text: str, model: str, code: bool) -> float:
+    prose, code_ratio = CHARS_PER_TOKEN[model_family(model)]
+    return len(text) / (code_ratio if code else prose)
+
+
+def estimate_tokens(text: str, model: str = "gemini", code: bool = False, factor: float = None) -> int:
+    """`factor` overrides this process's learned calibration; callers that may run in a pool
+    worker (where nothing has been learned) pass the server's factor explicitly."""
+    if not text:
+        return 0
+    encoding = _tiktoken_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    if factor is None:
+        factor = token_calibration.factor(model)
+    return int(_ratio_estimate(text, model, code) * factor) + 1
+
+
+# ---------- Language-aware compaction ----------
+
+HASH_COMMENT_LANGS = {"python", "ruby", "shell", "bash", "r", "perl"}
+C_STYLE_LANGS = {"c", "c++", "cpp", "java", "javascript", "typescript", "go", "rust", "c#", "csharp", "kotlin", "swift", "php"}
+
+_STRING = r'"""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`'
+_HASH_TOKENS = re.compile(rf'(?P<str>{_STRING})|(?P<comment>#[^\n]*)')
+_C_TOKENS = re.compile(rf'(?P<str>{_STRING})|(?P<comment>//[^\n]*|/\*[\s\S]*?\*/)')
+# Data rows (numbers / quoted literals); a digit or quote is required so lone closing braces stay code
+_DATA_LINE = re.compile(r'^(?=.*[\d"\'])[\s\d.,+\-eE\[\]{}()"\']+$')
+_BOILERPLATE_LINE = re.compile(r'^\s*(?:import\s|from\s\S+\simport\s|#include\s|using\s|package\s|require\()')
+
+LONG_LITERAL_CHARS = 80
+RUN_KEEP = 3  # lines kept from a long run of data / boilerplate lines
+
+
+def _language_family(language: str) -> str:
+    lang = (language or "").strip().lower()
+    if lang in HASH_COMMENT_LANGS or lang.startswith("python"):
+        return "hash"
+    if lang in C_STYLE_LANGS or lang.startswith(("c++", "java")):
+        return "c"
+    return "unknown"
+
+
+def strip_comments(code: str, language: str) -> str:
+    family = _language_family(language)
+    if family == "unknown":
+        return code
+    pattern = _HASH_TOKENS if family == "hash" else _C_TOKENS
+    return pattern.sub(lambda m: m.group("str") if m.group("str") is not None else "", code)
+
+
+def collapse_whitespace(code: str) -> str:
+    lines = [line.rstrip() for line in code.splitlines()]
+    collapsed = []
+    for line in lines:
+        if line or (collapsed and collapsed[-1]):
+            collapsed.append(line)
+    return "\n".join(collapsed).strip("\n")
+
+
+def elide_long_literals(code: str) -> str:
+    def shorten(m):
+        literal = m.group(0)
+        if len(literal) <= LONG_LITERAL_CHARS:
+            return literal
+        quote = literal[:3] if literal[:3] in ('"""', "'''") else literal[0]
+        return f"{literal[:24]}…[{len(literal) - 24} chars elided]{quote}"
+    return re.sub(_STRING, shorten, code)
+
+
+def elide_runs(code: str) -> str:
+    """Collapse long runs of data-only lines and import/include boilerplate."""
+    out, run, run_kind = [], [], None
+
+    def flush():
+        if len(run) > RUN_KEEP * 2:
+            out.extend(run[:RUN_KEEP])
+            out.append(f"... [{len(run) - RUN_KEEP - 1} similar {run_kind} lines elided]")
+            out.append(run[-1])
+        else:
+            out.extend(run)
+
+    for line in code.splitlines():
+        kind = "data" if line.strip() and _DATA_LINE.match(line) else "boilerplate" if _BOILERPLATE_LINE.match(line) else None
+        if kind and kind == run_kind:
+            run.append(line)
+            continue
+        flush()
+        run, run_kind = ([line], kind) if kind else ([], None)
+        if not kind:
+            out.append(line)
+    flush()
+    return "\n".join(out)
+
+
+def truncate_middle(code: str, budget: int, model: str, factor: float = None) -> str:
+    lines = code.splitlines()
+    head, tail = [], []
+    used = estimate_tokens("... [0000 lines elided to fit token budget] ...", model, code=True, factor=factor)
+    i, j = 0, len(lines) - 1
+    while i <= j:
+        line = lines[i] if len(head) <= len(tail) else lines[j]
+        cost = estimate_tokens(line + "\n", model, code=True, factor=factor)
+        if used + cost > budget:
+            break
+        used += cost
+        if len(head) <= len(tail):
+            head.append(line)
+            i += 1
+        else:
+            tail.insert(0, line)
+            j -= 1
+    if i > j:
+        return code
+    return "\n".join(head + [f"... [{j - i + 1} lines elided to fit token budget] ..."] + tail)
+
+
+def compact_code(code: str, language: str, budget: int, model: str = "gemini", lossy: bool = True,
+                 factor: float = None) -> str:
+    """Shrink code until it fits `budget` tokens, applying the cheapest transformations first.
+    Lossless stages (comments, whitespace) always keep the program's meaning; lossy stages
+    (literal/run elision, middle truncation) are skipped when `lossy` is False."""
+    if estimate_tokens(code, model, code=True, factor=factor) <= budget:
+        return code
+    stages = [lambda c: strip_comments(c, language), collapse_whitespace]
+    if lossy:
+        stages += [elide_long_literals, elide_runs, lambda c: truncate_middle(c, budget, model, factor)]
+    for stage in stages:
+        code = stage(code)
+        if estimate_tokens(code, model, code=True, factor=factor) <= budget:
+            break
+    return code
+
+
+# ---------- Metrics ----------
+
+class PromptMetrics:
+    """Per-task token savings and LLM latency, exposed through /llm/stats."""
+
+    def __init__(self):
+        self.tasks = defaultdict(lambda: {
+            "requests": 0, "compacted": 0, "tokensIn": 0, "tokensSent": 0,
+            "latencyMs": 0.0, "latencyCompactedMs": 0.0,
+        })
+
+    def record(self, task: str, tokens_in: int, tokens_sent: int, latency_s: float):
+        t = self.tasks[task]
+        t["requests"] += 1
+        t["tokensIn"] += tokens_in
+        t["tokensSent"] += tokens_sent
+        t["latencyMs"] += latency_s * 1000
+        if tokens_sent < tokens_in:
+            t["compacted"] += 1
+            t["latencyCompactedMs"] += latency_s * 1000
+
+    def snapshot(self) -> dict:
+        result = {}
+        for task, t in self.tasks.items():
+            plain = t["requests"] - t["compacted"]
+            result[task] = {
+                "requests": t["requests"],
+                "compacted": t["compacted"],
+                "tokensIn": t["tokensIn"],
+                "tokensSaved": t["tokensIn"] - t["tokensSent"],
+                "avgLatencyMs": round(t["latencyMs"] / t["requests"], 1),
+                "avgLatencyCompactedMs": round(t["latencyCompactedMs"] / t["compacted"], 1) if t["compacted"] else None,
+                "avgLatencyUncompactedMs": round((t["latencyMs"] - t["latencyCompactedMs"]) / plain, 1) if plain else None,
+            }
+        return result
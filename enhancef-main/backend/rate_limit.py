@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Per-route token buckets: (burst capacity, refill per minute). Applies per user.
+ROUTE_LIMITS = {
+    "chat": (5, 10),
+    "quiz": (3, 5),
+    "quiz_submit": (3, 6),
+    "code_evaluate": (3, 6),
+    "code_execute": (5, 10),
+    "interview_evaluate": (3, 6),
+    "interview_questions": (3, 5),
+    "communication_tips": (3, 5),
+}
+DAILY_LLM_TOKEN_BUDGET = int(os.environ.get('DAILY_LLM_TOKEN_BUDGET', '200000'))
+# A client IP gets this many users' worth of every limit and budget: a ceiling against user_id
+# rotation that still leaves room for a campus of students behind one NAT address.
+IP_LIMIT_SCALE = float(os.environ.get('RATE_LIMIT_IP_SCALE', '25'))
+# "local": per-process buckets only. "mongo": additionally share per-minute and daily counters across workers.
+RATE_LIMIT_MODE = os.environ.get('RATE_LIMIT_MODE', 'local')
+FLUSH_INTERVAL = float(os.environ.get('RATE_LIMIT_FLUSH_INTERVAL', '2'))
+PRUNE_INTERVAL = 60.0  # seconds between sweeps of idle buckets and past days, in every mode
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, per_minute: float, now: float):
+        self.capacity = capacity
+        self.rate = per_minute / 60
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1) -> float:
+        """Consume `cost` tokens; returns 0 on success, otherwise seconds until enough tokens refill."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """In-process token buckets plus daily LLM token accounting.
+
+    In "mongo" mode each worker also counts requests per (identity, route, minute) and tokens per
+    (identity, day) locally, and flush() pushes the deltas in one bulk write and pulls back the
+    cluster-wide totals. Checks never touch the database, so a rejection costs a dict lookup."""
+
+    def __init__(self, db=None, mode: str = RATE_LIMIT_MODE, limits: dict = None,
+                 daily_token_budget: int = DAILY_LLM_TOKEN_BUDGET, clock=time.monotonic, wall_clock=time.time):
+        self.db = db
+        self.mode = mode
+        self.limits = limits or ROUTE_LIMITS
+        self.daily_token_budget = daily_token_budget
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.buckets = {}
+        self.pending_requests = defaultdict(int)   # {(identity, route, minute): n} not yet flushed
+        self.shared_requests = {}                  # {(identity, route, minute): cluster total at last flush}
+        self.pending_tokens = defaultdict(int)     # {(identity, day): tokens} not yet flushed
+        self.used_tokens = defaultdict(int)        # {(identity, day): tokens} local + last known cluster total
+        self.last_pruned = clock()
+
+    def _day(self) -> str:
+        return datetime.fromtimestamp(self.wall_clock(), timezone.utc).date().isoformat()
+
+    def check(self, identity: str, route: str, scale: float = 1.0):
+        """Consume one request for `identity`; `scale` multiplies the route limits and daily budget."""
+        now = self.clock()
+        if now - self.last_pruned >= PRUNE_INTERVAL:
+            self.prune(now)
+        day = self._day()
+        if self.used_tokens.get((identity, day), 0) >= self.daily_token_budget * scale:
+            tomorrow = datetime.fromisoformat(day).replace(tzinfo=timezone.utc) + timedelta(days=1)
+            raise RateLimitExceeded("Daily AI usage budget exhausted", tomorrow.timestamp() - self.wall_clock())
+
+        capacity, per_minute = (limit * scale for limit in self.limits.get(route, (5, 10)))
+        key = (identity, route)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(capacity, per_minute, now)
+        wait = bucket.take(now)
+        if wait:
+            raise RateLimitExceeded(f"Too many {route} requests", wait)
+
+        if self.mode == "mongo":
+            minute = int(self.wall_clock() // 60)
+            window = (identity, route, minute)
+            if self.shared_requests.get(window, 0) + self.pending_requests.get(window, 0) >= capacity + per_minute:
+                bucket.tokens += 1  # not consumed after all
+                raise RateLimitExceeded(f"Too many {route} requests", 60 - self.wall_clock() % 60)
+            self.pending_requests[window] += 1
+
+    def record_tokens(self, identity: str, tokens: int):
+        if not tokens:
+            return
+        day = self._day()
+        self.used_tokens[(identity, day)] += tokens
+        if self.mode == "mongo":
+            self.pending_tokens[(identity, day)] += tokens
+
+    async def flush(self):
+        if self.mode != "mongo" or self.db is None:
+            return
+        requests, self.pending_requests = self.pending_requests, defaultdict(int)
+        tokens, self.pending_tokens = self.pending_tokens, defaultdict(int)
+        expire = datetime.now(timezone.utc) + timedelta(days=2)
+
+        if requests:
+            await self.db.rate_limits.bulk_write([
+                UpdateOne({"identity": i, "route": r, "minute": m}, {"$inc": {"count": n}, "$set": {"expireAt": expire}}, upsert=True)
+                for (i, r, m), n in requests.items()
+            ], ordered=False)
+        if tokens:
+            await self.db.llm_usage.bulk_write([
+                UpdateOne({"identity": i, "day": d}, {"$inc": {"tokens": n}, "$set": {"expireAt": expire}}, upsert=True)
+                for (i, d), n in tokens.items()
+            ], ordered=False)
+
+        # Pull back cluster-wide totals for the windows this worker is serving
+        minute = int(self.wall_clock() // 60)
+        identities = {i for (i, _r, m) in self.shared_requests if m == minute} | {i for (i, _r, _m) in requests}
+        self.shared_requests = {}
+        if identities:
+            async for doc in self.db.rate_limits.find({"identity": {"$in": list(identities)}, "minute": minute}):
+                self.shared_requests[(doc["identity"], doc["route"], minute)] = doc["count"]
+
+        day = self._day()
+        token_identities = {i for (i, d) in self.used_tokens if d == day}
+        if token_identities:
+            async for doc in self.db.llm_usage.find({"identity": {"$in": list(token_identities)}, "day": day}):
+                key = (doc["identity"], day)
+                self.used_tokens[key] = doc["tokens"] + self.pending_tokens.get(key, 0)
+        self.prune(self.clock())
+
+    def prune(self, now: float):
+        """Drop buckets that have refilled (indistinguishable from new ones) and past days' token counts,
+        so memory tracks currently active clients only."""
+        self.last_pruned = now
+        self.buckets = {k: b for k, b in self.buckets.items() if (now - b.updated) * b.rate < b.capacity}
+        day = self._day()
+        self.used_tokens = defaultdict(int, {k: v for k, v in self.used_tokens.items() if k[1] == day})
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Rate limit flush failed: {e!r}")
+
+    async def ensure_indexes(self):
+        if self.mode != "mongo" or self.db is None:
+            return
+        await self.db.rate_limits.create_index([("identity", 1), ("route", 1), ("minute", 1)], unique=True)
+        await self.db.llm_usage.create_index([("identity", 1), ("day", 1)], unique=True)
+        for collection in (self.db.rate_limits, self.db.llm_usage):
+            await collection.create_index("expireAt", expireAfterSeconds=0)
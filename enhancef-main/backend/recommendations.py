@@ -0,0 +1,109 @@
+# Declarative recommendation rules. Every rule reads only the precomputed context built by
+# build_context(), so adding a rule never adds a query. Bump RULES_VERSION whenever the table
+# changes; recompute_recommendations.py refreshes every stored list on an older version.
+RULES_VERSION = 2
+
+WEAK_SKILL_THRESHOLD = 50
+WEAK_TOPIC_ACCURACY = 60
+INACTIVE_DAYS = 3
+XP_PER_LEVEL = 500
+
+WEAKEST_ACTIONS = {
+    "Coding": "Solve 2 DSA problems in the Coding Arena today",
+    "Aptitude": "Complete a Quantitative Aptitude quiz in Aptitude Gym",
+    "Communication": "Take an AI Mock Interview in Comm Studio",
+}
+
+RULES = [
+    {
+        "id": "weakest_skill",
+        "when": lambda c: c["scores"][c["weakest"]] < WEAK_SKILL_THRESHOLD,
+        "title": "{weakest} Needs Attention",
+        "description": "{weakest_action}",
+        "priority": "High",
+        "module": lambda c: c["weakest"].lower(),
+    },
+    {
+        "id": "weak_quiz_topic",
+        "when": lambda c: c["weak_topic"] is not None,
+        "title": "Aptitude Accuracy Dropped",
+        "description": "Attempt {weak_topic} (Medium) Quiz Today",
+        "priority": "High",
+        "module": "aptitude",
+    },
+    {
+        "id": "inactive",
+        "when": lambda c: c["days_inactive"] is not None and c["days_inactive"] >= INACTIVE_DAYS,
+        "title": "You've Been Away",
+        "description": "You haven't practiced in {days_inactive} days. Start with a quick quiz to get back on track.",
+        "priority": "High",
+        "module": "aptitude",
+    },
+    {
+        "id": "try_interview",
+        "when": lambda c: c["interviews_given"] == 0 and c["quizzes_taken"] >= 2,
+        "title": "Try a Mock Interview",
+        "description": "You've been doing quizzes. Time to test your communication skills with an AI interview.",
+        "priority": "Medium",
+        "module": "communication",
+    },
+    {
+        "id": "coding_consistency",
+        "when": lambda c: 0 < c["codes_submitted"] < 5,
+        "title": "Build Coding Consistency",
+        "description": "Solve at least 1 DSA problem daily to maintain your streak and improve pattern recognition.",
+        "priority": "Medium",
+        "module": "coding",
+    },
+    {
+        "id": "almost_level_up",
+        "when": lambda c: c["xp_to_next"] <= 100,
+        "title": "Almost Level {next_level}!",
+        "description": "Only {xp_to_next} XP away. Complete one more activity to level up.",
+        "priority": "Low",
+        "module": "dashboard",
+    },
+]
+
+FALLBACK = {
+    "title": "Keep Going!",
+    "description": "Try a coding challenge or take a quiz to earn XP and level up.",
+    "priority": "Low",
+    "module": "dashboard",
+}
+
+
+def build_context(progress: dict, skill_scores: dict, last_active_day, today_day: int) -> dict:
+    """Everything the rules may look at, derived from the user's progress, score history and streak state."""
+    scores = {
+        "Coding": skill_scores["coding"]["ewma"],
+        "Aptitude": skill_scores["aptitude"]["ewma"],
+        "Communication": skill_scores["communication"]["ewma"],
+    }
+    weakest = min(scores, key=scores.get)
+    weak_topics = {t: acc for t, acc in skill_scores["topicAccuracy"].items() if acc < WEAK_TOPIC_ACCURACY}
+    xp = progress.get("xp", 0)
+    return {
+        "scores": scores,
+        "weakest": weakest,
+        "weakest_action": WEAKEST_ACTIONS[weakest],
+        "weak_topic": min(weak_topics, key=weak_topics.get) if weak_topics else None,
+        "days_inactive": today_day - last_active_day if last_active_day is not None else None,
+        "interviews_given": progress.get("interviews_given", skill_scores["communication"]["attempts"]),
+        "quizzes_taken": progress.get("quizzes_taken", skill_scores["aptitude"]["attempts"]),
+        "codes_submitted": progress.get("codes_submitted", skill_scores["coding"]["attempts"]),
+        "xp_to_next": XP_PER_LEVEL - (xp % XP_PER_LEVEL),
+        "next_level": progress.get("level", 1) + 1,
+    }
+
+
+def _resolve(value, context: dict):
+    return value(context) if callable(value) else value.format(**context)
+
+
+def evaluate(context: dict) -> list:
+    recommendations = [
+        {field: _resolve(rule[field], context) for field in ("title", "description", "priority", "module")}
+        for rule in RULES if rule["when"](context)
+    ]
+    return recommendations or [dict(FALLBACK)]
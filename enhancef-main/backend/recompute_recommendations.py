@@ -0,0 +1,22 @@
+import asyncio
+import sys
+from server import db, refresh_recommendations
+from recommendations import RULES_VERSION
+
+# Bulk refresh of materialized recommendations after a rules change.
+# By default only lists computed under an older RULES_VERSION are refreshed; pass --all to redo every user.
+
+async def recompute(force: bool):
+    user_ids = set(await db.score_history.distinct("userId"))
+    user_ids.update(await db.progress.distinct("user"))
+    if not force:
+        current = set(await db.recommendations.distinct("userId", {"rulesVersion": RULES_VERSION}))
+        user_ids -= current
+
+    for i, user_id in enumerate(sorted(user_ids), 1):
+        await refresh_recommendations(user_id)
+        if i % 100 == 0:
+            print(f"Refreshed {i}/{len(user_ids)}")
+    print(f"Recommendations refreshed for {len(user_ids)} users (rules v{RULES_VERSION})")
+
+asyncio.run(recompute("--all" in sys.argv))
@@ -0,0 +1,54 @@
+import asyncio
+import sys
+from collections import defaultdict
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+import streaks
+
+# Verify stored streaks against raw activity history. Pass --fix to overwrite mismatches.
+# Both sides are compared in normalized form (lapsed streaks read as 0), the same rule
+# reset_streak.py applies, so a reset entry is not drift.
+load_dotenv()
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+client = AsyncIOMotorClient(MONGO_URL)
+db = client[os.environ.get("DB_NAME", "elevate")]
+
+SOURCES = [("coding", "code_submissions"), ("aptitude", "quiz_attempts"), ("communication", "interviews")]
+# Also advanced by /progress/update, which leaves no raw record: raw history is only a lower bound
+PROGRESS_USERS = {"default"}
+
+async def recompute(fix: bool):
+    timezones = {}
+    async for user in db.users.find({"timezone": {"$exists": True}}, {"_id": 0, "id": 1, "timezone": 1}):
+        timezones[user["id"]] = user["timezone"]
+
+    days = defaultdict(set)  # {(userId, scope): {day, ...}}
+    for module, collection in SOURCES:
+        async for doc in db[collection].find({}, {"_id": 0, "userId": 1, "timestamp": 1}):
+            day = streaks.local_day(doc["timestamp"], timezones.get(doc["userId"]))
+            days[(doc["userId"], "all")].add(day)
+            days[(doc["userId"], module)].add(day)
+
+    checked = mismatched = 0
+    for (user_id, scope), active_days in days.items():
+        tz = timezones.get(user_id) or streaks.DEFAULT_TIMEZONE
+        today = streaks.today(tz)
+        raw = await db.streaks.find_one({"userId": user_id, "scope": scope}, {"_id": 0}) or streaks.empty_state()
+        stored = streaks.normalize(raw, today)
+        expected = streaks.normalize(streaks.recompute(active_days), today)
+        checked += 1
+        if user_id in PROGRESS_USERS:
+            if streaks.covers(stored, expected):
+                continue
+            expected = streaks.normalize(streaks.merge(raw, streaks.recompute(active_days)), today)
+        elif stored == expected:
+            continue
+        mismatched += 1
+        print(f"{user_id}/{scope}: stored {list(stored.values())} expected {list(expected.values())}")
+        if fix:
+            await db.streaks.update_one({"userId": user_id, "scope": scope}, {"$set": {**expected, "timezone": tz}}, upsert=True)
+
+    print(f"Checked {checked} streak entries, {mismatched} mismatched" + (" (fixed)" if fix and mismatched else ""))
+
+asyncio.run(recompute("--fix" in sys.argv))
@@ -2,6 +2,7 @@ import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
+import streaks
 
 load_dotenv()
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
@@ -9,7 +10,14 @@ client = AsyncIOMotorClient(MONGO_URL)
 db = client[os.environ.get("DB_NAME", "elevate")]
 
 async def reset():
-    result = await db.progress.update_many({}, {"$set": {"streak": 0}})
-    print(f"Streak reset to 0 for {result.modified_count} user entries")
+    # Only zero streaks that have actually lapsed in the user's own time zone; readers already
+    # apply the same lapse rule (streaks.normalize), so this only tidies stored values
+    reset_count = 0
+    async for state in db.streaks.find({"current_streak": {"$gt": 0}}):
+        normalized = streaks.normalize(state, streaks.today(state.get("timezone")))
+        if normalized["current_streak"] != state["current_streak"]:
+            await db.streaks.update_one({"_id": state["_id"]}, {"$set": {"current_streak": normalized["current_streak"]}})
+            reset_count += 1
+    print(f"Streak reset to 0 for {reset_count} lapsed streak entries")
 
 asyncio.run(reset())
@@ -1,7 +1,9 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
 import logging
 import uuid
@@ -13,6 +15,18 @@ from datetime import datetime, timezone
 import google.generativeai as genai
 import cv2
 from fastapi.responses import StreamingResponse
+from skill_scoring import ScoreHistory, score_histories, HISTORY_WINDOW, topic_key
+import streaks
+from fast_response import fast_json
+from model_router import ModelRouter
+from transcript_analysis import analyze_transcript, is_trivial, parse_wpm, summarize
+import recommendations as recommendation_rules
+from rate_limit import RateLimiter, RateLimitExceeded, IP_LIMIT_SCALE
+from cache_bus import UserCache, InvalidationBus, CACHE_BUS_MODE
+from executors import executors, offload, LoopLagMonitor
+from cpu_tasks import extract_json, compact_prompt_code, code_fingerprint
+from prompt_budget import (BodySizeLimitMiddleware, PromptMetrics, estimate_tokens, token_calibration,
+                           CODE_TOKEN_BUDGET, CHAT_CONTEXT_TOKEN_BUDGET)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env', override=True)
@@ -53,8 +67,9 @@ class InterviewEvalRequest(BaseModel):
     user_id: str = "default"
     question: str
     transcript: str
-    filler_words: int = 0
+    filler_words: int = 0  # client-side count; the server recomputes its own
     speech_speed: str = "normal"
+    duration_seconds: Optional[float] = None
 
 class ChatRequest(BaseModel):
     message: str
@@ -66,30 +81,79 @@ class ProgressUpdate(BaseModel):
     xp_earned: int = 0
     details: dict = {}
 
+class BatchAnalyticsRequest(BaseModel):
+    user_ids: List[str] = []
+    cohort_id: Optional[str] = None
+
 # ---------- Helpers ----------
 
 import json
-import re
-
-def extract_json(text: str) -> dict:
-    match = re.search(r'```(?:json)?\s*\n?([\s\S]*?)\n?```', text, re.IGNORECASE)
-    if match: text = match.group(1)
-    match2 = re.search(r'\{[\s\S]*\}', text)
-    if match2: text = match2.group(0)
-    try: return json.loads(text)
-    except: return {}
-
-async def get_ai_response(system_msg: str, user_msg: str) -> str:
+import time
+import math
+import hashlib
+import asyncio
+import base64
+import csv
+import io
+import zlib
+from collections import defaultdict, deque
+from bson import ObjectId
+from bson.errors import InvalidId
+from contextvars import ContextVar
+
+# CPU-heavy helpers (JSON extraction, code compaction/hashing) live in cpu_tasks.py and run in
+# the process pool; the monitor logs whatever still blocks the event loop.
+loop_lag_monitor = LoopLagMonitor()
+
+# Rate limiting: token buckets and daily LLM token budgets, checked before any expensive work.
+# user_id is client-supplied and unauthenticated, so per-user buckets are keyed on (user_id, client IP):
+# a client cannot drain another network's user, and rotating ids is capped by a per-IP ceiling
+# sized for many students sharing one campus NAT address (rate_limit.IP_LIMIT_SCALE).
+rate_limiter = RateLimiter(db)
+llm_caller = ContextVar("llm_caller", default=())
+
+def enforce_rate_limit(request: Request, route: str, user_id: str = "default") -> tuple:
+    ip = request.client.host if request.client else "unknown"
+    identities = ((f"ip:{ip}", IP_LIMIT_SCALE), (f"user:{user_id or 'default'}@{ip}", 1.0))
+    try:
+        for identity, scale in identities:
+            rate_limiter.check(identity, route, scale)
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+    llm_caller.set(tuple(identity for identity, _scale in identities))
+    return identities
+
+async def gemini_provider(model_name: str, system_msg: str, user_msg: str) -> str:
+    from dotenv import dotenv_values
+    config = dotenv_values(ROOT_DIR / '.env')
+    genai.configure(api_key=config.get('GEMINI_API_KEY', EMERGENT_LLM_KEY))
+    model = genai.GenerativeModel(model_name, system_instruction=system_msg)
+    response = await model.generate_content_async(user_msg)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        token_calibration.observe(model_name, system_msg + user_msg, getattr(usage, "prompt_token_count", 0) or 0)
+    if usage is not None:
+        for identity in llm_caller.get():
+            rate_limiter.record_tokens(identity, getattr(usage, "total_token_count", 0) or 0)
+    return response.text
+
+model_router = ModelRouter(gemini_provider)
+
+prompt_metrics = PromptMetrics()
+
+def prompt_model(task: str) -> str:
+    return model_router.candidates(task)[0]
+
+async def get_ai_response(system_msg: str, user_msg: str, task: str = "chat", saved_tokens: int = 0) -> str:
+    tokens_sent = estimate_tokens(system_msg + user_msg, prompt_model(task))
+    start = time.monotonic()
     try:
-        from dotenv import dotenv_values
-        config = dotenv_values(ROOT_DIR / '.env')
-        genai.configure(api_key=config.get('GEMINI_API_KEY', EMERGENT_LLM_KEY))
-        model = genai.GenerativeModel('gemini-2.5-flash', system_instruction=system_msg)
-        response = await model.generate_content_async(user_msg)
-        return response.text
+        result = await model_router.generate(task, system_msg, user_msg)
+        prompt_metrics.record(task, tokens_sent + saved_tokens, tokens_sent, time.monotonic() - start)
+        return result
     except Exception as e:
-        logger.error(f"AI Error: {e}")
-        raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
+        logger.error(f"AI Error: {e!r}")
+        raise HTTPException(status_code=500, detail=f"AI service error: {str(e) or type(e).__name__}")
 
 async def get_or_create_progress():
     progress = await db.progress.find_one({"user": "default"}, {"_id": 0})
@@ -98,7 +162,6 @@ async def get_or_create_progress():
             "user": "default",
             "xp": 0,
             "level": 1,
-            "streak": 0,
             "last_active": datetime.now(timezone.utc).isoformat(),
             "quizzes_taken": 0,
             "interviews_given": 0,
@@ -109,6 +172,194 @@ async def get_or_create_progress():
         await db.progress.insert_one({**progress})
     return progress
 
+# Array-backed score history: one small document per user with parallel score/epoch arrays
+# per module, appended on every scored write so scoring never re-reads the raw attempts.
+# Arrays are capped at the last HISTORY_WINDOW attempts; attempt counts and per-topic aptitude
+# accuracy are running totals. All modules are kept on a 0-100 scale (coding logic scores are stored /10).
+SCORE_HISTORY_SCHEMA = 2  # documents from older schemas are rebuilt from raw attempts on first use
+SCORE_HISTORY_SOURCES = [
+    ("coding", "code_submissions", lambda d: d.get("score", 0) * 10),
+    ("aptitude", "quiz_attempts", lambda d: d.get("score", 0)),
+    ("communication", "interviews", lambda d: (d.get("clarityScore", 0) + d.get("confidenceScore", 0)) / 2),
+]
+
+def to_epoch(iso_ts: str) -> int:
+    return int(datetime.fromisoformat(iso_ts).timestamp())
+
+async def backfill_score_history(user_id: str) -> dict:
+    doc = {"userId": user_id, "schema": SCORE_HISTORY_SCHEMA}
+    for module, collection, score_of in SCORE_HISTORY_SOURCES:
+        scores, ts, count = deque(maxlen=HISTORY_WINDOW), deque(maxlen=HISTORY_WINDOW), 0
+        topic_sums, topic_counts = defaultdict(float), defaultdict(int)
+        projection = {"_id": 0, "score": 1, "clarityScore": 1, "confidenceScore": 1, "topic": 1, "timestamp": 1}
+        async for d in db[collection].find({"userId": user_id}, projection).sort("timestamp", 1):
+            score = score_of(d)
+            scores.append(score)
+            ts.append(to_epoch(d["timestamp"]))
+            count += 1
+            if module == "aptitude":
+                key = topic_key(d.get("topic", "General"))
+                topic_sums[key] += score
+                topic_counts[key] += 1
+        doc[module] = {"scores": list(scores), "ts": list(ts), "count": count}
+        if module == "aptitude":
+            doc[module].update(topicSums=dict(topic_sums), topicCounts=dict(topic_counts))
+    try:
+        await db.score_history.replace_one({"userId": user_id, "schema": {"$ne": SCORE_HISTORY_SCHEMA}}, doc, upsert=True)
+    except DuplicateKeyError:
+        pass  # a concurrent request backfilled first
+    return doc
+
+async def load_score_history(user_id: str) -> ScoreHistory:
+    doc = await db.score_history.find_one({"userId": user_id}, {"_id": 0})
+    if not doc or doc.get("schema") != SCORE_HISTORY_SCHEMA:
+        doc = await backfill_score_history(user_id)
+    return ScoreHistory.from_document(doc)
+
+async def record_score(user_id: str, module: str, score: float, timestamp: str, topic: Optional[str] = None):
+    update = {
+        "$push": {
+            f"{module}.scores": {"$each": [score], "$slice": -HISTORY_WINDOW},
+            f"{module}.ts": {"$each": [to_epoch(timestamp)], "$slice": -HISTORY_WINDOW},
+        },
+        "$inc": {f"{module}.count": 1},
+    }
+    if topic is not None:
+        key = topic_key(topic)
+        update["$inc"].update({f"{module}.topicSums.{key}": score, f"{module}.topicCounts.{key}": 1})
+    result = await db.score_history.update_one({"userId": user_id, "schema": SCORE_HISTORY_SCHEMA}, update)
+    if result.matched_count == 0:
+        # First scored write for this user (or an old-schema document): rebuild from raw attempts,
+        # which include this one
+        await backfill_score_history(user_id)
+
+# Streaks: one document per (userId, scope) maintained by the shared engine in streaks.py
+ACTION_MODULES = {"quiz_complete": "aptitude", "interview_complete": "communication", "code_submit": "coding"}
+
+async def get_user_timezone(user_id: str) -> str:
+    tz = user_cache.get(user_id, "timezone")
+    if tz is None:
+        user = await db.users.find_one({"id": user_id}, {"_id": 0, "timezone": 1})
+        tz = (user or {}).get("timezone") or streaks.DEFAULT_TIMEZONE
+        user_cache.set(user_id, "timezone", tz)
+    return tz
+
+async def backfill_streaks(user_id: str, tz: str) -> dict:
+    """Build every scope's streak state from raw activity, for users who predate the streaks collection."""
+    days = {scope: set() for scope in streaks.SCOPES}
+    for module, collection, _score_of in SCORE_HISTORY_SOURCES:
+        async for d in db[collection].find({"userId": user_id}, {"_id": 0, "timestamp": 1}):
+            day = streaks.local_day(d["timestamp"], tz)
+            days["all"].add(day)
+            days[module].add(day)
+    states = {scope: {**streaks.recompute(active), "timezone": tz} for scope, active in days.items()}
+    if user_id == "default":
+        # /progress/update used to keep this user's streak on the progress document only
+        legacy = await db.progress.find_one({"user": "default"}, {"_id": 0, "streak": 1, "last_active": 1}) or {}
+        if legacy.get("streak") and legacy.get("last_active"):
+            streak = legacy["streak"]
+            states["all"] = streaks.merge(states["all"], {
+                "current_streak": streak, "max_streak": streak,
+                "last_active_day": streaks.local_day(legacy["last_active"], tz),
+            })
+    try:
+        await db.streaks.bulk_write([
+            UpdateOne({"userId": user_id, "scope": scope}, {"$setOnInsert": state}, upsert=True)
+            for scope, state in states.items()
+        ], ordered=False)
+    except BulkWriteError:
+        pass  # a concurrent request backfilled first
+    return states
+
+async def update_streak(user_id: str, module: Optional[str], timestamp: str):
+    tz = await get_user_timezone(user_id)
+    pipeline = streaks.update_pipeline(streaks.local_day(timestamp, tz)) + [{"$set": {"timezone": tz}}]
+    scopes = ["all"] + ([module] if module else [])
+    result = await db.streaks.bulk_write(
+        [UpdateOne({"userId": user_id, "scope": scope}, pipeline) for scope in scopes], ordered=False)
+    if result.matched_count < len(scopes):
+        # First streak write for this user: backfill from raw history, then apply this activity.
+        # Re-applying a day a state already counts leaves it unchanged, so matched scopes are safe.
+        await backfill_streaks(user_id, tz)
+        await db.streaks.bulk_write(
+            [UpdateOne({"userId": user_id, "scope": scope}, pipeline, upsert=True) for scope in scopes],
+            ordered=False,
+        )
+
+async def load_streak(user_id: str, scope: str = "all") -> dict:
+    state = await db.streaks.find_one({"userId": user_id, "scope": scope}, {"_id": 0})
+    if state is None:
+        state = (await backfill_streaks(user_id, await get_user_timezone(user_id)))[scope]
+    return state
+
+async def get_streak(user_id: str, scope: str = "all") -> dict:
+    state = await load_streak(user_id, scope)
+    return {
+        "current": streaks.effective_current(state, streaks.today(state.get("timezone"))),
+        "max": state.get("max_streak", 0),
+    }
+
+# Per-user data version: bumped on every write path, so dashboard reads can answer
+# If-None-Match with a 304 from one point lookup instead of re-running their queries.
+# All of these change with the user's own writes, so browsers must revalidate every time
+# (a 304 is one point lookup); a max-age would hide a fresh submission from its author.
+CACHE_CONTROL = {
+    "progress": "private, no-cache",
+    "analytics": "private, no-cache",
+    "heatmap": "private, no-cache",
+    "profile": "private, no-cache",
+}
+
+# Per-user read cache (data version + computed payloads). Entries are keyed by data version,
+# evicted locally on writes and across workers by the invalidation bus (cache_bus.py).
+user_cache = UserCache(enabled=CACHE_BUS_MODE != "off")
+invalidation_bus = InvalidationBus(db, user_cache)
+
+async def get_data_version(user_id: str) -> int:
+    version = user_cache.get(user_id, "version")
+    if version is None:
+        doc = await db.user_versions.find_one({"userId": user_id}, {"_id": 0, "version": 1})
+        version = (doc or {}).get("version", 0)
+        user_cache.set(user_id, "version", version)
+    return version
+
+async def bump_data_version(user_id: str):
+    await db.user_versions.update_one(
+        {"userId": user_id}, {"$inc": {"version": 1}, "$currentDate": {"updatedAt": True}}, upsert=True)
+    user_cache.evict(user_id)
+
+def freshness_period(tz: str) -> str:
+    # Folded into both the ETag and the cache key so time-derived fields refresh, and a body computed
+    # in an earlier period is never served under a new ETag. The user's local day turns over exactly
+    # when streaks lapse (local midnight, e.g. 18:30 UTC for IST); the UTC hour covers the rest.
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%d%H')}|{streaks.today(tz)}"
+
+def make_etag(route: str, user_id: str, version: int, *parts) -> str:
+    raw = "|".join(str(p) for p in (route, user_id, version, *parts))
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()[:20]}"'
+
+async def not_modified(request: Request, response: Response, route: str, user_id: str, *parts) -> Optional[Response]:
+    version = await get_data_version(user_id)
+    period = freshness_period(await get_user_timezone(user_id))
+    request.state.cache_key = (route, version, period, *parts)
+    etag = make_etag(route, user_id, version, period, *parts)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL[route]}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+async def record_activity(user_id: str, module: str, score: float, timestamp: str, topic: Optional[str] = None):
+    await record_score(user_id, module, score, timestamp, topic=topic)
+    await update_streak(user_id, module, timestamp)
+    await bump_data_version(user_id)
+    await refresh_recommendations(user_id)
+
+async def with_streak(progress: dict) -> dict:
+    streak = await get_streak(progress.get("user", "default"))
+    return {**progress, "streak": streak["current"], "max_streak": streak["max"]}
+
 # ---------- Routes ----------
 
 @api_router.get("/")
@@ -117,18 +368,25 @@ async def root():
 
 # --- Progress ---
 @api_router.get("/progress")
-async def get_progress():
-    return await get_or_create_progress()
+async def get_progress(request: Request, response: Response):
+    if cached := await not_modified(request, response, "progress", "default"):
+        return cached
+    if (hit := user_cache.get("default", request.state.cache_key)) is not None:
+        return hit
+    progress = await with_streak(await get_or_create_progress())
+    user_cache.set("default", request.state.cache_key, progress)
+    return progress
 
 @api_router.post("/progress/update")
 async def update_progress(req: ProgressUpdate):
     progress = await get_or_create_progress()
     xp = progress["xp"] + req.xp_earned
     level = 1 + xp // 500
+    now = datetime.now(timezone.utc).isoformat()
     updates = {
         "xp": xp,
         "level": level,
-        "last_active": datetime.now(timezone.utc).isoformat(),
+        "last_active": now,
     }
     if req.action == "quiz_complete":
         updates["quizzes_taken"] = progress["quizzes_taken"] + 1
@@ -137,29 +395,21 @@ async def update_progress(req: ProgressUpdate):
     elif req.action == "code_submit":
         updates["codes_submitted"] = progress["codes_submitted"] + 1
 
-    # Streak logic
-    last_dt = datetime.fromisoformat(progress["last_active"])
-    now_dt = datetime.now(timezone.utc)
-    last_date = last_dt.date()
-    now_date = now_dt.date()
-
-    updates["streak"] = progress.get("streak", 0)
-    if now_date > last_date:
-        if (now_date - last_date).days == 1:
-            updates["streak"] += 1
-        else:
-            updates["streak"] = 1
-    elif updates["streak"] == 0:
-        updates["streak"] = 1
-
     await db.progress.update_one({"user": "default"}, {"$set": updates})
+    await update_streak("default", ACTION_MODULES.get(req.action), now)
+    await bump_data_version("default")
+    await refresh_recommendations("default")
     updated = await db.progress.find_one({"user": "default"}, {"_id": 0})
-    return updated
+    return await with_streak(updated)
 
 # --- User Profile & Analytics ---
 
 @api_router.get("/user/profile/{user_id}")
-async def get_user_profile(user_id: str):
+async def get_user_profile(user_id: str, request: Request, response: Response):
+    if cached := await not_modified(request, response, "profile", user_id):
+        return cached
+    if (hit := user_cache.get(user_id, request.state.cache_key)) is not None:
+        return hit
     user = await db.users.find_one({"id": user_id}, {"_id": 0})
     if not user:
         # Mock payload for currently non-synced clerk users
@@ -185,7 +435,7 @@ async def get_user_profile(user_id: str):
 
     overall = (avg_coding + avg_apt + avg_int) / 3 if (avg_coding or avg_apt or avg_int) else 0
 
-    return {
+    profile = {
         "name": user.get("name", "Guest User"),
         "email": user.get("email", ""),
         "joinedAt": user.get("createdAt", datetime.now(timezone.utc).isoformat()),
@@ -194,6 +444,8 @@ async def get_user_profile(user_id: str):
         "totalInterviewAttempts": interview_count,
         "overallSkillScore": round(overall, 1)
     }
+    user_cache.set(user_id, request.state.cache_key, profile)
+    return profile
 
 class SkillEngine:
     @staticmethod
@@ -210,7 +462,11 @@ class SkillEngine:
         return weakest, recommendations[weakest]
 
 @api_router.get("/analytics/{user_id}")
-async def get_analytics(user_id: str):
+async def get_analytics(user_id: str, request: Request, response: Response):
+    if cached := await not_modified(request, response, "analytics", user_id):
+        return cached
+    if (hit := user_cache.get(user_id, request.state.cache_key)) is not None:
+        return hit
     coding_cursor = db.code_submissions.find({"userId": user_id}).sort("timestamp", -1).limit(5)
     coding_docs = await coding_cursor.to_list(length=5)
     coding_scores = [doc.get("score", 0) for doc in coding_docs]
@@ -234,89 +490,167 @@ async def get_analytics(user_id: str):
     for d in int_docs: all_recent.append({"module": "communication", "score": ((d.get("clarityScore", 0) + d.get("confidenceScore", 0)) / 2), "date": d.get("timestamp")})
         
     all_recent.sort(key=lambda x: x["date"])
+    skill_scores = score_histories([await load_score_history(user_id)])[0]
 
-    return {
+    analytics = {
         "codingAverage": round(avg_coding, 1),
         "aptitudeAverage": round(avg_apt, 1),
         "communicationAverage": round(avg_int, 1),
         "weakestSkill": weakest_skill,
         "recommendation": recommendation,
-        "recentPerformance": all_recent[-10:]
+        "recentPerformance": all_recent[-10:],
+        "skillScores": skill_scores,
     }
+    user_cache.set(user_id, request.state.cache_key, analytics)
+    return analytics
+
+# --- Batch (cohort) Analytics ---
+# One aggregation per collection for the whole batch instead of three sorted
+# queries per student. Each pipeline keeps only the 5 most recent scores per
+# user (same window as /analytics/{user_id}) and is sorted by userId so the
+# three cursors can be merged while streaming.
+
+BATCH_ANALYTICS_TTL = int(os.environ.get('BATCH_ANALYTICS_TTL', '60'))
+BATCH_ANALYTICS_MAX_ENTRIES = int(os.environ.get('BATCH_ANALYTICS_MAX_ENTRIES', '64'))
+# {user-id set hash: {"ndjson": [lines]}}, LRU-capped and TTL-bounded like the per-user cache
+batch_analytics_cache = UserCache(ttl=BATCH_ANALYTICS_TTL, max_users=BATCH_ANALYTICS_MAX_ENTRIES)
+
+INTERVIEW_SCORE_EXPR = {"$divide": [{"$add": [{"$ifNull": ["$clarityScore", 0]}, {"$ifNull": ["$confidenceScore", 0]}]}, 2]}
+BATCH_SKILL_SOURCES = [
+    ("coding", "code_submissions", {"$ifNull": ["$score", 0]}),
+    ("aptitude", "quiz_attempts", {"$ifNull": ["$score", 0]}),
+    ("communication", "interviews", INTERVIEW_SCORE_EXPR),
+]
+
+def batch_skill_pipeline(user_ids: List[str], score_expr) -> list:
+    return [
+        {"$match": {"userId": {"$in": user_ids}}},
+        {"$group": {
+            "_id": "$userId",
+            "count": {"$sum": 1},
+            "recent": {"$topN": {"n": 5, "sortBy": {"timestamp": -1}, "output": score_expr}},
+        }},
+        {"$project": {"count": 1, "average": {"$avg": "$recent"}}},
+        {"$sort": {"_id": 1}},
+    ]
+
+async def _next_or_none(cursor):
+    try:
+        return await cursor.next()
+    except StopAsyncIteration:
+        return None
+
+async def stream_batch_analytics(user_ids: List[str]):
+    cursors, heads = {}, {}
+    for module, collection, score_expr in BATCH_SKILL_SOURCES:
+        cursors[module] = db[collection].aggregate(batch_skill_pipeline(user_ids, score_expr), allowDiskUse=True)
+        heads[module] = await _next_or_none(cursors[module])
+
+    for user_id in user_ids:
+        averages, counts = {}, {}
+        for module, _, _ in BATCH_SKILL_SOURCES:
+            head = heads[module]
+            if head is not None and head["_id"] == user_id:
+                averages[module] = head.get("average") or 0
+                counts[module] = head.get("count", 0)
+                heads[module] = await _next_or_none(cursors[module])
+            else:
+                averages[module] = 0
+                counts[module] = 0
+
+        weakest_skill, recommendation = SkillEngine.detect_weakest_skill(
+            averages["coding"], averages["aptitude"], averages["communication"])
+        yield json.dumps({
+            "userId": user_id,
+            "codingAverage": round(averages["coding"], 1),
+            "aptitudeAverage": round(averages["aptitude"], 1),
+            "communicationAverage": round(averages["communication"], 1),
+            "weakestSkill": weakest_skill,
+            "recommendation": recommendation,
+            "totalCodingAttempts": counts["coding"],
+            "totalAptitudeAttempts": counts["aptitude"],
+            "totalInterviewAttempts": counts["communication"],
+        }) + "\n"
+
+async def _cached_batch_analytics(key: str, user_ids: List[str]):
+    lines = []
+    async for line in stream_batch_analytics(user_ids):
+        lines.append(line)
+        yield line
+    batch_analytics_cache.set(key, "ndjson", lines)
+
+async def _replay(lines: List[str]):
+    for line in lines:
+        yield line
+
+@api_router.post("/analytics/batch")
+async def get_batch_analytics(req: BatchAnalyticsRequest, cached: bool = False):
+    user_ids = set(req.user_ids)
+    if req.cohort_id:
+        async for user in db.users.find({"cohortId": req.cohort_id}, {"_id": 0, "id": 1}):
+            if user.get("id"):
+                user_ids.add(user["id"])
+    if not user_ids:
+        raise HTTPException(status_code=400, detail="Provide user_ids or a cohort_id with enrolled users")
+    user_ids = sorted(user_ids)
+
+    media_type = "application/x-ndjson"
+    if not cached:
+        return StreamingResponse(stream_batch_analytics(user_ids), media_type=media_type)
+
+    key = hashlib.sha1("\n".join(user_ids).encode()).hexdigest()
+    hit = batch_analytics_cache.get(key, "ndjson")
+    if hit is not None:
+        return StreamingResponse(_replay(hit), media_type=media_type, headers={"X-Cache": "HIT"})
+    return StreamingResponse(_cached_batch_analytics(key, user_ids), media_type=media_type, headers={"X-Cache": "MISS"})
 
 @api_router.get("/analytics/heatmap/{user_id}")
-async def get_analytics_heatmap(user_id: str, module: str = "all"):
+async def get_analytics_heatmap(user_id: str, request: Request, response: Response, module: str = "all"):
+    if cached := await not_modified(request, response, "heatmap", user_id, module):
+        return cached
+    if (hit := user_cache.get(user_id, request.state.cache_key)) is not None:
+        return fast_json(request, hit, response)
     from collections import defaultdict
     from datetime import timedelta
     
     activity_map = defaultdict(int)
     one_year_ago = datetime.now(timezone.utc) - timedelta(days=365)
     query = {"userId": user_id, "timestamp": {"$gte": one_year_ago.isoformat()}}
+    projection = {"_id": 0, "timestamp": 1}
+    tz = await get_user_timezone(user_id)
 
     # Fetch data based on module filter
     if module in ["all", "coding"]:
-        async for doc in db.code_submissions.find(query):
-            dt = datetime.fromisoformat(doc["timestamp"]).date().isoformat()
-            activity_map[dt] += 1
+        async for doc in db.code_submissions.find(query, projection):
+            activity_map[streaks.local_date(doc["timestamp"], tz).isoformat()] += 1
             
     if module in ["all", "aptitude"]:
-        async for doc in db.quiz_attempts.find(query):
-            dt = datetime.fromisoformat(doc["timestamp"]).date().isoformat()
-            activity_map[dt] += 1
+        async for doc in db.quiz_attempts.find(query, projection):
+            activity_map[streaks.local_date(doc["timestamp"], tz).isoformat()] += 1
             
     if module in ["all", "communication"]:
-        async for doc in db.interviews.find(query):
-            dt = datetime.fromisoformat(doc["timestamp"]).date().isoformat()
-            activity_map[dt] += 1
-            
-    active_dates = sorted(activity_map.keys())
-    
-    # Calculate Streaks
-    current_streak = 0
-    max_streak = 0
-    
-    if active_dates:
-        # Evaluate Max Streak
-        temp_streak = 1
-        for i in range(1, len(active_dates)):
-            d1 = datetime.fromisoformat(active_dates[i-1]).date()
-            d2 = datetime.fromisoformat(active_dates[i]).date()
-            if (d2 - d1).days == 1:
-                temp_streak += 1
-            else:
-                max_streak = max(max_streak, temp_streak)
-                temp_streak = 1
-        max_streak = max(max_streak, temp_streak)
-        
-        # Evaluate Current Streak
-        today = datetime.now(timezone.utc).date()
-        yesterday = today - timedelta(days=1)
-        
-        last_active = datetime.fromisoformat(active_dates[-1]).date()
-        if last_active == today or last_active == yesterday:
-            current_streak = 1
-            curr_d = last_active
-            for j in range(len(active_dates)-2, -1, -1):
-                prev_d = datetime.fromisoformat(active_dates[j]).date()
-                if (curr_d - prev_d).days == 1:
-                    current_streak += 1
-                    curr_d = prev_d
-                else:
-                    break
+        async for doc in db.interviews.find(query, projection):
+            activity_map[streaks.local_date(doc["timestamp"], tz).isoformat()] += 1
+
+    # Streaks come from the incremental engine, not from re-walking the dates
+    streak = await get_streak(user_id, module if module in streaks.SCOPES else "all")
 
     daily_activity = [{"date": k, "count": v} for k, v in activity_map.items()]
 
-    return {
+    heatmap = {
         "totalSubmissions": sum(activity_map.values()),
-        "activeDays": len(active_dates),
-        "currentStreak": current_streak,
-        "maxStreak": max_streak,
+        "activeDays": len(activity_map),
+        "currentStreak": streak["current"],
+        "maxStreak": streak["max"],
         "dailyActivity": daily_activity
     }
+    user_cache.set(user_id, request.state.cache_key, heatmap)
+    return fast_json(request, heatmap, response)
 
 # --- Code Evaluation ---
 @api_router.post("/code/evaluate")
-async def evaluate_code(req: CodeEvalRequest):
+async def evaluate_code(req: CodeEvalRequest, request: Request):
+    enforce_rate_limit(request, "code_evaluate", req.user_id)
     system_msg = """You are Elevate AI — a coding evaluator for placement readiness.
 Be direct, analytical. Avoid motivational fluff.
 When given code, you must:
@@ -336,43 +670,57 @@ Respond in structured JSON format:
   "scores": {"logic": X, "optimization": X, "code_quality": X},
   "roadmap": "..."
 }"""
-    user_msg = f"Problem: {req.problem_statement}\nExpected: {req.expected_behavior}\nLanguage: {req.language}\nCode:\n```\n{req.code}\n```"
-    result = await get_ai_response(system_msg, user_msg)
-    parsed = extract_json(result)
+    model = prompt_model("code_evaluation")
+    code = await compact_prompt_code(req.code, req.language, CODE_TOKEN_BUDGET, model, token_calibration.factor(model))
+    saved = estimate_tokens(req.code, model, code=True) - estimate_tokens(code, model, code=True)
+    note = "\nNote: the code was compacted to fit the review budget (comments, long literals or repeated lines elided); do not penalize the elisions." if code != req.code else ""
+    user_msg = f"Problem: {req.problem_statement}\nExpected: {req.expected_behavior}\nLanguage: {req.language}{note}\nCode:\n```\n{code}\n```"
+    result = await get_ai_response(system_msg, user_msg, task="code_evaluation", saved_tokens=saved)
+    parsed = await extract_json(result)
     score = parsed.get("scores", {}).get("logic", 0)
+    timestamp = datetime.now(timezone.utc).isoformat()
 
     await db.code_submissions.insert_one({
         "id": str(uuid.uuid4()),
         "userId": req.user_id,
         "score": score,
         "code": req.code,
+        "codeHash": await code_fingerprint(req.code, req.language),
         "language": req.language,
         "problem": req.problem_statement,
         "evaluation": result,
-        "timestamp": datetime.now(timezone.utc).isoformat()
+        "timestamp": timestamp
     })
+    await record_activity(req.user_id, "coding", score * 10, timestamp)
 
     return {"evaluation": result}
 
 # --- Chatbot API ---
 @api_router.post("/chat")
-async def process_chat(req: ChatRequest):
+async def process_chat(req: ChatRequest, request: Request):
+    enforce_rate_limit(request, "chat")
     system_msg = """You are Elevate AI, an expert coding assistant.
 You are helping the user write, debug, and optimize their code. 
 Be concise, helpful, and provide code examples when relevant.
 Whenever you provide advice, format it nicely."""
     
     # Build up the context string based on what the user has currently inputted
-    user_msg = f"Current Context:\n{req.context}\n\nUser Question:\n{req.message}"
+    model = prompt_model("chat")
+    context = await compact_prompt_code(req.context, "", CHAT_CONTEXT_TOKEN_BUDGET, model, token_calibration.factor(model))
+    saved = estimate_tokens(req.context, model, code=True) - estimate_tokens(context, model, code=True)
+    user_msg = f"Current Context:\n{context}\n\nUser Question:\n{req.message}"
     
     # Simple direct generation (Optionally can map req.history if complex multi-turn needed, 
     # but passing concatenated context + question string is sufficient for a basic bot)
-    result = await get_ai_response(system_msg, user_msg)
+    result = await get_ai_response(system_msg, user_msg, task="chat", saved_tokens=saved)
     return {"reply": result}
 
 # --- Code Execution (Judge0 proxy) ---
+JUDGE0_LANGUAGES = {50: "c", 54: "c++", 62: "java", 63: "javascript", 71: "python", 74: "typescript", 60: "go", 73: "rust"}
+
 @api_router.post("/code/execute")
-async def execute_code(req: CodeExecRequest):
+async def execute_code(req: CodeExecRequest, request: Request):
+    enforce_rate_limit(request, "code_execute")
     # Use Judge0 CE public instance
     judge0_url = "https://judge0-ce.p.rapidapi.com/submissions"
     headers = {
@@ -391,8 +739,13 @@ async def execute_code(req: CodeExecRequest):
         system_msg = """You are a code execution simulator. Execute the given code mentally and return the output.
 Respond ONLY in JSON: {"stdout": "...", "stderr": "", "status": {"description": "Accepted"}, "time": "0.01", "memory": 256}
 If there's an error, put it in stderr and set status description to "Runtime Error" or "Compilation Error"."""
-        user_msg = f"Language ID: {req.language_id}\nStdin: {req.stdin}\nCode:\n```\n{req.source_code}\n```"
-        result = await get_ai_response(system_msg, user_msg)
+        # Simulated execution must preserve behaviour, so only lossless compaction is applied
+        model = prompt_model("code_execution")
+        source = await compact_prompt_code(req.source_code, JUDGE0_LANGUAGES.get(req.language_id, ""), CODE_TOKEN_BUDGET, model,
+                                           token_calibration.factor(model), lossy=False)
+        saved = estimate_tokens(req.source_code, model, code=True) - estimate_tokens(source, model, code=True)
+        user_msg = f"Language ID: {req.language_id}\nStdin: {req.stdin}\nCode:\n```\n{source}\n```"
+        result = await get_ai_response(system_msg, user_msg, task="code_execution", saved_tokens=saved)
         return {"result": result, "simulated": True}
 
     try:
@@ -404,18 +757,20 @@ If there's an error, put it in stderr and set status description to "Runtime Err
 
 # --- Quiz ---
 @api_router.get("/quiz/{topic}")
-async def get_quiz(topic: str):
+async def get_quiz(topic: str, request: Request, user_id: str = "default"):
+    enforce_rate_limit(request, "quiz", user_id)
     system_msg = """You are an aptitude quiz generator for placement readiness.
 Generate exactly 10 multiple choice questions on the given topic.
 Respond in JSON array format:
 [{"question": "...", "options": ["A", "B", "C", "D"], "correct": 0, "explanation": "..."}]
 where correct is the 0-based index of the correct option.
 Questions should be placement-level difficulty."""
-    result = await get_ai_response(system_msg, f"Generate 10 MCQ questions on: {topic}")
+    result = await get_ai_response(system_msg, f"Generate 10 MCQ questions on: {topic}", task="quiz")
     return {"topic": topic, "questions": result}
 
 @api_router.post("/quiz/submit")
-async def submit_quiz(req: QuizSubmitRequest):
+async def submit_quiz(req: QuizSubmitRequest, request: Request):
+    enforce_rate_limit(request, "quiz_submit", req.user_id)
     score = req.answers.get("score", 0)
     total = req.total_questions
 
@@ -430,7 +785,7 @@ Respond in JSON:
 {"weak_concepts": [...], "topics_to_revise": [...], "practice_intensity": "...", "readiness_score": X, "next_topic": "..."}"""
 
     user_msg = f"Topic: {req.topic}\nScore: {score}/{total}\nWeak areas: User got {total - score} wrong"
-    analysis = await get_ai_response(system_msg, user_msg)
+    analysis = await get_ai_response(system_msg, user_msg, task="quiz_analysis")
     # Scale score to 10-100 logically for database matching
     mapped_score = (score / total) * 100 if total > 0 else 0
 
@@ -444,25 +799,45 @@ Respond in JSON:
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
     await db.quiz_attempts.insert_one({**record})
+    await record_activity(req.user_id, "aptitude", mapped_score, record["timestamp"], topic=req.topic)
 
     return {"score": score, "total": total, "analysis": analysis}
 
 # --- Interview Evaluation ---
 @api_router.post("/interview/evaluate")
-async def evaluate_interview(req: InterviewEvalRequest):
+async def evaluate_interview(req: InterviewEvalRequest, request: Request):
+    enforce_rate_limit(request, "interview_evaluate", req.user_id)
     system_msg = """You are Elevate AI — a communication & interview coach.
 When given an interview response, you must:
 1. Evaluate clarity, confidence, structure
-2. Detect overused filler words
+2. Interpret the pre-computed speech metrics (fillers, pace, structure) — do not recount them
 3. Suggest improvements
 4. Give scores: Clarity (/10), Confidence (/10), Professionalism (/10)
 5. Provide a refined improved sample answer
 Respond in JSON:
 {"clarity_score": X, "confidence_score": X, "professionalism_score": X, "feedback": "...", "filler_analysis": "...", "improvements": [...], "sample_answer": "..."}"""
 
-    user_msg = f"Question: {req.question}\nTranscript: {req.transcript}\nFiller words detected: {req.filler_words}\nSpeech speed: {req.speech_speed}"
-    result = await get_ai_response(system_msg, user_msg)
-    parsed = extract_json(result)
+    # Pace is only measured from the recording duration. The client's live WPM readout (speech_speed)
+    # can still guide the prompt, but it is kept apart so it never lands in stored pace analytics
+    metrics = analyze_transcript(req.transcript, req.duration_seconds)
+    client_wpm = parse_wpm(req.speech_speed)
+    prompt_metrics = metrics if metrics["wordsPerMinute"] is not None else {**metrics, "wordsPerMinute": client_wpm}
+
+    # Nothing to score: answer locally instead of spending an LLM call
+    if is_trivial(metrics):
+        return {"evaluation": json.dumps({
+            "clarity_score": 0,
+            "confidence_score": 0,
+            "professionalism_score": 0,
+            "feedback": "The answer was too short to evaluate. Aim for at least a few complete sentences.",
+            "filler_analysis": f"{metrics['fillerCount']} filler words in {metrics['wordCount']} words.",
+            "improvements": ["Structure your answer as situation, action and result.", "Speak for at least 30 seconds."],
+            "sample_answer": "",
+        }), "metrics": metrics}
+
+    user_msg = f"Question: {req.question}\nSpeech metrics: {summarize(prompt_metrics)}\nTranscript: {req.transcript}"
+    result = await get_ai_response(system_msg, user_msg, task="interview_evaluation")
+    parsed = await extract_json(result)
 
     record = {
         "id": str(uuid.uuid4()),
@@ -472,36 +847,49 @@ Respond in JSON:
         "grammarScore": getattr(parsed, "grammar_score", 0), # Optional tracking if added to prompt
         "clarityScore": parsed.get("clarity_score", 0) * 10, # Convert /10 to /100
         "confidenceScore": parsed.get("confidence_score", 0) * 10, # Convert /10 to /100
+        "fillerWords": metrics["fillerCount"],
+        "wordsPerMinute": metrics["wordsPerMinute"],
+        "clientReportedWpm": client_wpm,
+        "speechMetrics": metrics,
         "evaluation": result,
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
     await db.interviews.insert_one({**record})
+    await record_activity(req.user_id, "communication", (record["clarityScore"] + record["confidenceScore"]) / 2, record["timestamp"])
 
-    return {"evaluation": result}
+    return {"evaluation": result, "metrics": metrics}
 
 # --- Video Feed ---
-def gen_frames():
-    camera = cv2.VideoCapture(0)
+# Camera reads block and cv2 releases the GIL while encoding, so both run on the I/O thread pool;
+# a process pool would have to pickle every raw frame across.
+@offload("io")
+def read_jpeg_frame(camera):
+    success, frame = camera.read()
+    if not success:
+        return None
+    ret, buffer = cv2.imencode('.jpg', frame)
+    return buffer.tobytes() if ret else b''
+
+async def gen_frames():
+    camera = await executors.run_io(cv2.VideoCapture, 0)
     if not camera.isOpened():
         logger.error("Could not open video device")
         while True:
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + b'' + b'\r\n')
-            
+            await asyncio.sleep(1)
+
     try:
         while True:
-            success, frame = camera.read()
-            if not success:
+            frame_bytes = await read_jpeg_frame(camera)
+            if frame_bytes is None:
                 break
-            else:
-                ret, buffer = cv2.imencode('.jpg', frame)
-                if not ret:
-                    continue
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+            if not frame_bytes:
+                continue
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
     finally:
-        camera.release()
+        await executors.run_io(camera.release)
 
 @api_router.get("/video_feed")
 async def video_feed():
@@ -509,130 +897,187 @@ async def video_feed():
 
 # --- Interview Questions ---
 @api_router.get("/interview/questions")
-async def get_interview_questions():
+async def get_interview_questions(request: Request, user_id: str = "default"):
+    enforce_rate_limit(request, "interview_questions", user_id)
     system_msg = "You are an interview question generator. Generate 5 common placement interview questions. Respond as JSON array of strings."
-    result = await get_ai_response(system_msg, "Generate 5 common placement interview questions covering HR, technical, and behavioral topics")
+    result = await get_ai_response(system_msg, "Generate 5 common placement interview questions covering HR, technical, and behavioral topics", task="interview_questions")
     return {"questions": result}
 
+# --- Cache bus stats ---
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    return invalidation_bus.snapshot()
+
+# --- Runtime stats ---
+@api_router.get("/runtime/stats")
+async def get_runtime_stats():
+    return {"executors": executors.snapshot(), "eventLoop": loop_lag_monitor.snapshot()}
+
+# --- LLM routing stats ---
+@api_router.get("/llm/stats")
+async def get_llm_stats():
+    return {"models": model_router.snapshot(), "prompts": prompt_metrics.snapshot(), "tokenCalibration": token_calibration.snapshot()}
+
 # --- History ---
 @api_router.get("/history/quizzes")
-async def get_quiz_history():
+async def get_quiz_history(request: Request):
     records = await db.quiz_attempts.find({}, {"_id": 0}).sort("timestamp", -1).to_list(50)
-    return records
+    return fast_json(request, records)
 
 @api_router.get("/history/interviews")
-async def get_interview_history():
+async def get_interview_history(request: Request):
     records = await db.interviews.find({}, {"_id": 0}).sort("timestamp", -1).to_list(50)
-    return records
+    return fast_json(request, records)
 
 @api_router.get("/history/code")
-async def get_code_history():
+async def get_code_history(request: Request):
     records = await db.code_submissions.find({}, {"_id": 0}).sort("timestamp", -1).to_list(50)
-    return records
+    return fast_json(request, records)
+
+# --- Export ---
+# Full activity export streamed straight from Motor cursors in batches: constant memory,
+# NDJSON or gzip-compressed CSV, filterable by date range and module. Every row carries a
+# cursor token; passing the last one received as ?cursor= resumes an interrupted download.
+
+EXPORT_SOURCES = [("coding", "code_submissions"), ("aptitude", "quiz_attempts"), ("communication", "interviews")]
+EXPORT_BATCH_SIZE = 500
+EXPORT_CSV_FIELDS = [
+    "module", "id", "timestamp", "score", "topic", "total", "language", "problem", "code",
+    "question", "transcript", "clarityScore", "confidenceScore", "evaluation", "analysis", "cursor",
+]
+
+def encode_export_cursor(module_index: int, timestamp: str, oid: ObjectId) -> str:
+    raw = json.dumps([module_index, timestamp, str(oid)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_export_cursor(token: str):
+    try:
+        module_index, timestamp, oid = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return int(module_index), timestamp, ObjectId(oid)
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid export cursor")
+
+async def iter_export_rows(user_id: str, modules: List[str], since: Optional[str], until: Optional[str], resume=None):
+    for index, (module, collection) in enumerate(EXPORT_SOURCES):
+        if module not in modules or (resume and index < resume[0]):
+            continue
+        query = {"userId": user_id}
+        if since or until:
+            query["timestamp"] = {k: v for k, v in (("$gte", since), ("$lt", until)) if v}
+        if resume and index == resume[0]:
+            _, ts, oid = resume
+            query = {"$and": [query, {"$or": [{"timestamp": {"$gt": ts}}, {"timestamp": ts, "_id": {"$gt": oid}}]}]}
+        cursor = db[collection].find(query).sort([("timestamp", 1), ("_id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+        async for doc in cursor:
+            oid = doc.pop("_id")
+            doc["module"] = module
+            doc["cursor"] = encode_export_cursor(index, doc.get("timestamp", ""), oid)
+            yield doc
+
+async def stream_export(rows, fmt: str):
+    compressor = zlib.compressobj(wbits=31) if fmt == "csv" else None  # wbits=31: gzip container
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_FIELDS, extrasaction="ignore") if fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+    pending = 0
+
+    def drain(final: bool = False) -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        if compressor is None:
+            return data
+        # Sync-flush per batch so the client can decompress what it has so far
+        return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+    async for row in rows:
+        if writer:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row, default=str) + "\n")
+        pending += 1
+        if pending >= EXPORT_BATCH_SIZE:
+            pending = 0
+            yield drain()
+    yield drain(final=True)
+
+@api_router.get("/export/{user_id}")
+async def export_activity(user_id: str, format: str = "ndjson", modules: str = "coding,aptitude,communication",
+                          since: Optional[str] = None, until: Optional[str] = None, cursor: Optional[str] = None):
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    selected = [m.strip() for m in modules.split(",") if m.strip()]
+    if not selected or any(m not in dict(EXPORT_SOURCES) for m in selected):
+        raise HTTPException(status_code=400, detail=f"modules must be a subset of {', '.join(dict(EXPORT_SOURCES))}")
+    resume = decode_export_cursor(cursor) if cursor else None
+
+    rows = iter_export_rows(user_id, selected, since, until, resume)
+    if format == "csv":
+        headers = {"Content-Disposition": f'attachment; filename="elevate-{user_id}.csv.gz"'}
+        return StreamingResponse(stream_export(rows, "csv"), media_type="application/gzip", headers=headers)
+    headers = {"Content-Disposition": f'attachment; filename="elevate-{user_id}.ndjson"'}
+    return StreamingResponse(stream_export(rows, "ndjson"), media_type="application/x-ndjson", headers=headers)
 
 # --- Communication Tips ---
 @api_router.post("/communication/tips")
-async def get_communication_tips():
+async def get_communication_tips(request: Request, user_id: str = "default"):
+    enforce_rate_limit(request, "communication_tips", user_id)
     system_msg = """You are a professional communication coach. Provide structured communication tips for interview success.
 Respond in JSON:
 {"tips": [{"title": "...", "description": "...", "practice": "..."}], "filler_words_to_avoid": [...], "body_language_tips": [...]}"""
-    result = await get_ai_response(system_msg, "Give me 5 key communication tips for placement interviews")
+    result = await get_ai_response(system_msg, "Give me 5 key communication tips for placement interviews", task="communication_tips")
     return {"tips": result}
 
 # --- Recommendation Engine ---
-@api_router.get("/recommendations")
-async def get_recommendations():
-    progress = await get_or_create_progress()
-    quizzes = await db.quiz_attempts.find({}, {"_id": 0}).sort("timestamp", -1).to_list(10)
-
-    recommendations = []
-
-    # 1. Detect weakest skill
-    coding_score = min(100, progress.get("codes_submitted", 0) * 15)
-    aptitude_score = min(100, progress.get("quizzes_taken", 0) * 12)
-    comm_score = min(100, progress.get("interviews_given", 0) * 20)
-
-    scores = {"Coding": coding_score, "Aptitude": aptitude_score, "Communication": comm_score}
-    weakest = min(scores, key=scores.get)
-
-    if scores[weakest] < 50:
-        action_map = {
-            "Coding": "Solve 2 DSA problems in the Coding Arena today",
-            "Aptitude": "Complete a Quantitative Aptitude quiz in Aptitude Gym",
-            "Communication": "Take an AI Mock Interview in Comm Studio",
-        }
-        recommendations.append({
-            "title": f"{weakest} Needs Attention",
-            "description": action_map[weakest],
-            "priority": "High",
-            "module": weakest.lower(),
-        })
-
-    # 2. Quiz topic weakness
-    if quizzes:
-        low_scores = [q for q in quizzes if q.get("total", 1) > 0 and (q.get("score", 0) / q.get("total", 1)) < 0.6]
-        if low_scores:
-            weak_topic = low_scores[0].get("topic", "General")
-            recommendations.append({
-                "title": "Aptitude Accuracy Dropped",
-                "description": f"Attempt {weak_topic} (Medium) Quiz Today",
-                "priority": "High",
-                "module": "aptitude",
-            })
+# Recommendations are materialized per user and recomputed only when an activity write or a
+# day rollover (or a rules version change) invalidates them; the endpoint is a point read.
+# Each list records the data version it was computed from, read before the inputs, and a write
+# never replaces a list computed from a newer version, so concurrent refreshes cannot go backwards.
+
+async def refresh_recommendations(user_id: str) -> dict:
+    version_doc = await db.user_versions.find_one({"userId": user_id}, {"_id": 0, "version": 1})
+    data_version = (version_doc or {}).get("version", 0)
+    progress = await db.progress.find_one({"user": user_id}, {"_id": 0}) or {}
+    skill_scores = score_histories([await load_score_history(user_id)])[0]
+    streak_state = await load_streak(user_id, "all")
+    tz = streak_state.get("timezone") or await get_user_timezone(user_id)
+    today = streaks.today(tz)
+    context = recommendation_rules.build_context(progress, skill_scores, streak_state.get("last_active_day"), today)
+    doc = {
+        "userId": user_id,
+        "recommendations": recommendation_rules.evaluate(context),
+        "scores": context["scores"],
+        "rulesVersion": recommendation_rules.RULES_VERSION,
+        "computedDay": today,
+        "timezone": tz,
+        "dataVersion": data_version,
+    }
+    # Equal versions may replace: day rollovers and rules changes recompute at an unchanged version
+    not_newer = {"$or": [{"dataVersion": {"$lte": data_version}}, {"dataVersion": {"$exists": False}}]}
+    try:
+        await db.recommendations.replace_one({"userId": user_id, **not_newer}, doc, upsert=True)
+    except DuplicateKeyError:
+        # A list computed from a newer version is already stored; serve that one
+        doc = await db.recommendations.find_one({"userId": user_id}, {"_id": 0}) or doc
+    return doc
 
-    # 3. Inactivity check
-    from datetime import timedelta
-    last_active = datetime.fromisoformat(progress.get("last_active", datetime.now(timezone.utc).isoformat()))
-    days_inactive = (datetime.now(timezone.utc) - last_active).days
-    if days_inactive >= 3:
-        recommendations.append({
-            "title": "You've Been Away",
-            "description": "You haven't practiced in " + str(days_inactive) + " days. Start with a quick quiz to get back on track.",
-            "priority": "High",
-            "module": "aptitude",
-        })
-
-    # 4. Interview performance gap
-    if progress.get("interviews_given", 0) == 0 and progress.get("quizzes_taken", 0) >= 2:
-        recommendations.append({
-            "title": "Try a Mock Interview",
-            "description": "You've been doing quizzes. Time to test your communication skills with an AI interview.",
-            "priority": "Medium",
-            "module": "communication",
-        })
-
-    # 5. Coding streak
-    if progress.get("codes_submitted", 0) > 0 and progress.get("codes_submitted", 0) < 5:
-        recommendations.append({
-            "title": "Build Coding Consistency",
-            "description": "Solve at least 1 DSA problem daily to maintain your streak and improve pattern recognition.",
-            "priority": "Medium",
-            "module": "coding",
-        })
-
-    # 6. Level up encouragement
-    xp_to_next = 500 - (progress.get("xp", 0) % 500)
-    if xp_to_next <= 100:
-        recommendations.append({
-            "title": f"Almost Level {progress.get('level', 1) + 1}!",
-            "description": f"Only {xp_to_next} XP away. Complete one more activity to level up.",
-            "priority": "Low",
-            "module": "dashboard",
-        })
-
-    # If no specific recommendations, give a general one
-    if not recommendations:
-        recommendations.append({
-            "title": "Keep Going!",
-            "description": "Try a coding challenge or take a quiz to earn XP and level up.",
-            "priority": "Low",
-            "module": "dashboard",
-        })
-
-    return {"recommendations": recommendations, "scores": scores}
+@api_router.get("/recommendations")
+async def get_recommendations(user_id: str = "default"):
+    doc = await db.recommendations.find_one({"userId": user_id}, {"_id": 0})
+    stale = (
+        not doc
+        or doc.get("rulesVersion") != recommendation_rules.RULES_VERSION
+        or doc.get("computedDay") != streaks.today(doc.get("timezone"))
+    )
+    if stale:
+        doc = await refresh_recommendations(user_id)
+    return {"recommendations": doc["recommendations"], "scores": doc["scores"]}
 
 app.include_router(api_router)
 
+app.add_middleware(BodySizeLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -641,6 +1086,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def ensure_indexes():
+    # Per-user activity reads (analytics, batch analytics, heatmap) all filter on userId and order by timestamp
+    for collection in ("code_submissions", "quiz_attempts", "interviews"):
+        await db[collection].create_index([("userId", 1), ("timestamp", -1)])
+    await db.score_history.create_index("userId", unique=True)
+    await db.streaks.create_index([("userId", 1), ("scope", 1)], unique=True)
+    await db.user_versions.create_index("userId", unique=True)
+    await db.recommendations.create_index("userId", unique=True)
+
+@app.on_event("startup")
+async def start_rate_limiter():
+    await rate_limiter.ensure_indexes()
+    if rate_limiter.mode == "mongo":
+        app.state.rate_limit_flusher = asyncio.create_task(rate_limiter.run())
+
+@app.on_event("startup")
+async def start_invalidation_bus():
+    await db.user_versions.create_index("updatedAt")
+    app.state.invalidation_bus = asyncio.create_task(invalidation_bus.run())
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    app.state.loop_lag_monitor = asyncio.create_task(loop_lag_monitor.run())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in ("invalidation_bus", "loop_lag_monitor"):
+        if background := getattr(app.state, task, None):
+            background.cancel()
+    flusher = getattr(app.state, "rate_limit_flusher", None)
+    if flusher:
+        flusher.cancel()
+        await rate_limiter.flush()
+    executors.shutdown()
     client.close()
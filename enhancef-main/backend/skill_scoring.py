@@ -0,0 +1,126 @@
+import numpy as np
+
+MODULES = ("coding", "aptitude", "communication")
+
+# EWMA half-life in attempts; attempts older than EWMA_WINDOW carry < 0.1% weight and are skipped
+EWMA_HALFLIFE = 8
+EWMA_WINDOW = 128
+EWMA_DECAY = 0.5 ** (1 / EWMA_HALFLIFE)
+# Trend slope (score points per attempt) is fitted over the most recent attempts only
+TREND_WINDOW = 20
+# Stored score/timestamp arrays are capped to the attempts the scores above can still see;
+# attempt counts and per-topic accuracy are kept as running totals instead.
+HISTORY_WINDOW = max(EWMA_WINDOW, TREND_WINDOW)
+
+
+def topic_key(topic: str) -> str:
+    """Topic names are user-supplied; map the characters MongoDB reserves in field names."""
+    return topic.replace(".", "\uff0e").replace("$", "\uff04")
+
+
+def topic_name(key: str) -> str:
+    return key.replace("\uff0e", ".").replace("\uff04", "$")
+
+
+class ScoreHistory:
+    """Compact per-user score history: the last HISTORY_WINDOW scores (float32) and epoch
+    seconds (int64) per module, total attempts per module, and running aptitude sums and
+    counts per topic."""
+
+    __slots__ = ("user_id", "scores", "timestamps", "counts", "topic_names", "topic_sums", "topic_counts")
+
+    def __init__(self, user_id, scores=None, timestamps=None, counts=None,
+                 topic_names=None, topic_sums=None, topic_counts=None):
+        self.user_id = user_id
+        self.scores = {m: np.asarray((scores or {}).get(m, ()), dtype=np.float32) for m in MODULES}
+        self.timestamps = {m: np.asarray((timestamps or {}).get(m, ()), dtype=np.int64) for m in MODULES}
+        self.counts = {m: int((counts or {}).get(m, self.scores[m].size)) for m in MODULES}
+        self.topic_names = list(topic_names or [])
+        self.topic_sums = np.asarray(topic_sums if topic_sums is not None else (), dtype=np.float64)
+        self.topic_counts = np.asarray(topic_counts if topic_counts is not None else (), dtype=np.int64)
+
+    @classmethod
+    def from_document(cls, doc: dict):
+        """Build from a `score_history` document: {module: {"scores": [...], "ts": [...],
+        "count": n}, ...}, with "topicSums"/"topicCounts" maps on the aptitude section."""
+        scores, timestamps, counts = {}, {}, {}
+        for m in MODULES:
+            section = doc.get(m) or {}
+            scores[m] = section.get("scores", ())
+            timestamps[m] = section.get("ts", ())
+            counts[m] = section.get("count", len(scores[m]))
+        aptitude = doc.get("aptitude") or {}
+        sums, topic_counts = aptitude.get("topicSums") or {}, aptitude.get("topicCounts") or {}
+        keys = list(topic_counts)
+        return cls(doc.get("userId"), scores, timestamps, counts, [topic_name(k) for k in keys],
+                   [sums.get(k, 0) for k in keys], [topic_counts[k] for k in keys])
+
+    def attempts(self, module: str) -> int:
+        return self.counts[module]
+
+
+def _right_aligned(arrays, width: int):
+    """Stack the last `width` values of each array into an (n, width) matrix, right-aligned,
+    with a boolean mask marking the real values."""
+    values = np.zeros((len(arrays), width), dtype=np.float64)
+    mask = np.zeros((len(arrays), width), dtype=bool)
+    for i, arr in enumerate(arrays):
+        tail = arr[-width:]
+        if tail.size:
+            values[i, width - tail.size:] = tail
+            mask[i, width - tail.size:] = True
+    return values, mask
+
+
+def ewma(arrays) -> np.ndarray:
+    """Exponentially weighted average per array, newest attempt weighted highest. 0 for empty arrays."""
+    values, mask = _right_aligned(arrays, EWMA_WINDOW)
+    weights = (EWMA_DECAY ** np.arange(EWMA_WINDOW - 1, -1, -1)) * mask
+    total = weights.sum(axis=1)
+    return np.divide((weights * values).sum(axis=1), total, out=np.zeros(len(arrays)), where=total > 0)
+
+
+def trend(arrays) -> np.ndarray:
+    """Least-squares slope over the last TREND_WINDOW attempts. 0 when fewer than 2 attempts."""
+    values, mask = _right_aligned(arrays, TREND_WINDOW)
+    x = np.broadcast_to(np.arange(TREND_WINDOW, dtype=np.float64), values.shape) * mask
+    n = mask.sum(axis=1)
+    sx, sy = x.sum(axis=1), values.sum(axis=1)
+    sxy, sxx = (x * values).sum(axis=1), (x * x).sum(axis=1)
+    denom = n * sxx - sx * sx
+    return np.divide(n * sxy - sx * sy, denom, out=np.zeros(len(arrays)), where=(n >= 2) & (denom != 0))
+
+
+def topic_accuracy(histories) -> list:
+    """Mean aptitude score per topic over each user's full history, from the running totals."""
+    offsets = np.cumsum([0] + [len(h.topic_names) for h in histories])
+    sums = np.concatenate([h.topic_sums for h in histories] or [np.empty(0)])
+    counts = np.concatenate([h.topic_counts for h in histories] or [np.empty(0, np.int64)])
+    means = np.divide(sums, counts, out=np.zeros(offsets[-1]), where=counts > 0)
+    return [
+        {name: round(float(means[offsets[i] + j]), 1) for j, name in enumerate(h.topic_names)}
+        for i, h in enumerate(histories)
+    ]
+
+
+def score_histories(histories) -> list:
+    """Score many users at once: per-module EWMA, trend and attempt count, plus aptitude topic accuracy."""
+    if not histories:
+        return []
+    per_module = {}
+    for m in MODULES:
+        arrays = [h.scores[m] for h in histories]
+        per_module[m] = (ewma(arrays), trend(arrays))
+    topics = topic_accuracy(histories)
+
+    results = []
+    for i, h in enumerate(histories):
+        result = {"userId": h.user_id, "topicAccuracy": topics[i]}
+        for m in MODULES:
+            result[m] = {
+                "ewma": round(float(per_module[m][0][i]), 1),
+                "trend": round(float(per_module[m][1][i]), 2),
+                "attempts": h.attempts(m),
+            }
+        results.append(result)
+    return results
@@ -0,0 +1,119 @@
+import os
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Streaks are tracked per user and scope ("all" plus one per module) as three integers:
+# current_streak, max_streak and last_active_day (proleptic ordinal of the user's local date).
+DEFAULT_TIMEZONE = os.environ.get("STREAK_TIMEZONE", "UTC")
+SCOPES = ("all", "coding", "aptitude", "communication")
+
+
+@lru_cache(maxsize=256)
+def get_zone(name: str = None) -> ZoneInfo:
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo("UTC")
+
+
+def local_date(ts, tz_name: str = None) -> date:
+    """Calendar date of a timestamp (datetime or ISO string) in the given time zone."""
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(get_zone(tz_name)).date()
+
+
+def local_day(ts, tz_name: str = None) -> int:
+    return local_date(ts, tz_name).toordinal()
+
+
+def today(tz_name: str = None) -> int:
+    return local_day(datetime.now(timezone.utc), tz_name)
+
+
+def empty_state() -> dict:
+    return {"current_streak": 0, "max_streak": 0, "last_active_day": None}
+
+
+def advance(state: dict, day: int) -> dict:
+    """Apply one activity on `day` in O(1). Activity older than last_active_day is ignored."""
+    last = state.get("last_active_day")
+    current = state.get("current_streak", 0)
+    if last is None or day > last + 1:
+        current = 1
+    elif day == last + 1:
+        current += 1
+    elif day < last:
+        return state
+    return {
+        "current_streak": current,
+        "max_streak": max(state.get("max_streak", 0), current),
+        "last_active_day": day if last is None else max(last, day),
+    }
+
+
+def effective_current(state: dict, today_day: int) -> int:
+    """A streak survives until the end of the day after the last activity."""
+    last = state.get("last_active_day")
+    if last is None or today_day - last > 1:
+        return 0
+    return state.get("current_streak", 0)
+
+
+def normalize(state: dict, today_day: int) -> dict:
+    """The state as readers see it, with a lapsed streak's current at 0. Maintenance scripts
+    compare and write this form, so zeroing a lapsed streak is never reported as drift."""
+    return {
+        "current_streak": effective_current(state, today_day),
+        "max_streak": state.get("max_streak", 0),
+        "last_active_day": state.get("last_active_day"),
+    }
+
+
+def merge(a: dict, b: dict) -> dict:
+    """Combine two states built from different activity sources: the more recent one supplies
+    the current streak, and the longer max wins."""
+    if (b.get("last_active_day") or 0, b.get("current_streak", 0)) > (a.get("last_active_day") or 0, a.get("current_streak", 0)):
+        a, b = b, a
+    return {**a, "max_streak": max(a.get("max_streak", 0), b.get("max_streak", 0), a.get("current_streak", 0))}
+
+
+def covers(stored: dict, expected: dict) -> bool:
+    """True when `stored` includes at least the activity in `expected` (it may include more)."""
+    return (
+        (stored.get("last_active_day") or 0) >= (expected.get("last_active_day") or 0)
+        and stored.get("max_streak", 0) >= expected.get("max_streak", 0)
+    )
+
+
+def recompute(days) -> dict:
+    """Rebuild the state from raw activity days (any order, duplicates allowed)."""
+    state = empty_state()
+    for day in sorted(set(days)):
+        state = advance(state, day)
+    return state
+
+
+def update_pipeline(day: int) -> list:
+    """Server-side equivalent of advance() as an update pipeline, so concurrent writers
+    never race on a read-modify-write of the streak fields."""
+    last = {"$ifNull": ["$last_active_day", None]}
+    return [
+        {"$set": {
+            "current_streak": {"$switch": {
+                "branches": [
+                    {"case": {"$eq": [last, None]}, "then": 1},
+                    {"case": {"$eq": [last, day - 1]}, "then": {"$add": [{"$ifNull": ["$current_streak", 0]}, 1]}},
+                    {"case": {"$gte": [last, day]}, "then": "$current_streak"},
+                ],
+                "default": 1,
+            }},
+        }},
+        {"$set": {
+            "max_streak": {"$max": [{"$ifNull": ["$max_streak", 0]}, "$current_streak"]},
+            "last_active_day": {"$max": [last, day]},
+        }},
+    ]
@@ -0,0 +1,85 @@
+import re
+from collections import Counter
+
+# Same filler list the Comm Studio highlights client-side
+FILLER_WORDS = ["um", "uh", "like", "you know", "basically", "actually", "so", "well", "i mean", "kind of", "sort of"]
+
+# Single compiled automaton: longest phrases first so "you know" wins over any single-word prefix,
+# and elongated hesitations ("ummm", "uhh") collapse onto their base filler.
+_ORDERED_FILLERS = sorted(FILLER_WORDS, key=len, reverse=True)
+_FILLER_PATTERNS = {"um": r"um+", "uh": r"uh+"}
+
+def _filler_pattern(word: str) -> str:
+    return _FILLER_PATTERNS.get(word) or r"\s+".join(map(re.escape, word.split()))
+
+FILLER_RE = re.compile(
+    r"\b(?:" + "|".join(f"(?P<f{i}>{_filler_pattern(w)})" for i, w in enumerate(_ORDERED_FILLERS)) + r")\b",
+    re.IGNORECASE,
+)
+_FILLER_BY_GROUP = {f"f{i}": w for i, w in enumerate(_ORDERED_FILLERS)}
+
+WORD_RE = re.compile(r"[a-zA-Z']+")
+SENTENCE_RE = re.compile(r"[^.!?]+")
+LONG_SENTENCE_WORDS = 30
+MIN_WORDS = 5  # below this there is nothing to score
+
+STOPWORDS = frozenset(
+    "a an the and or but if of to in on at for with is am are was were be been i me my we our you your "
+    "it its this that these those as by from have has had do did not".split()
+)
+
+
+def analyze_transcript(transcript: str, duration_seconds: float = None) -> dict:
+    """Deterministic speech metrics computed before any LLM call."""
+    words = [w.lower() for w in WORD_RE.findall(transcript)]
+    word_count = len(words)
+
+    fillers = Counter(_FILLER_BY_GROUP[m.lastgroup] for m in FILLER_RE.finditer(transcript))
+    filler_count = sum(fillers.values())
+
+    sentences = [len(WORD_RE.findall(s)) for s in SENTENCE_RE.findall(transcript)]
+    sentences = [n for n in sentences if n]
+    avg_sentence = sum(sentences) / len(sentences) if sentences else 0
+
+    content = [w for w in words if w not in STOPWORDS]
+    bigrams = Counter(zip(words, words[1:]))
+    repeated_bigrams = sum(c - 1 for c in bigrams.values() if c > 1)
+
+    return {
+        "wordCount": word_count,
+        "fillerCount": filler_count,
+        "fillerBreakdown": dict(fillers),
+        "fillerRatio": round(filler_count / word_count, 3) if word_count else 0,
+        "wordsPerMinute": round(word_count / (duration_seconds / 60)) if duration_seconds else None,
+        "sentenceCount": len(sentences),
+        "avgSentenceLength": round(avg_sentence, 1),
+        "longSentenceRatio": round(sum(n > LONG_SENTENCE_WORDS for n in sentences) / len(sentences), 2) if sentences else 0,
+        "lexicalDiversity": round(len(set(content)) / len(content), 2) if content else 0,
+        "repeatedPhraseRatio": round(repeated_bigrams / max(1, len(words) - 1), 3),
+        "topRepeatedWords": [w for w, c in Counter(content).most_common(3) if c > 2],
+    }
+
+
+def is_trivial(metrics: dict) -> bool:
+    return metrics["wordCount"] < MIN_WORDS
+
+
+def parse_wpm(speech_speed: str):
+    """Fallback pace from the client's "120 WPM" label when no duration is supplied."""
+    match = re.search(r"\d+", speech_speed or "")
+    return int(match.group(0)) if match else None
+
+
+def summarize(metrics: dict) -> str:
+    """Compact one-paragraph summary for the LLM prompt."""
+    fillers = ", ".join(f"{w} x{n}" for w, n in sorted(metrics["fillerBreakdown"].items(), key=lambda kv: -kv[1])) or "none"
+    pace = f"{metrics['wordsPerMinute']} WPM" if metrics["wordsPerMinute"] else "unknown"
+    repeated = ", ".join(metrics["topRepeatedWords"]) or "none"
+    return (
+        f"Words: {metrics['wordCount']}. Filler words: {metrics['fillerCount']} ({fillers}), "
+        f"{metrics['fillerRatio'] * 100:.1f}% of words. Pace: {pace}. "
+        f"Sentences: {metrics['sentenceCount']}, avg {metrics['avgSentenceLength']} words, "
+        f"{metrics['longSentenceRatio'] * 100:.0f}% over {LONG_SENTENCE_WORDS} words. "
+        f"Lexical diversity: {metrics['lexicalDiversity']}. Repeated phrases: {metrics['repeatedPhraseRatio'] * 100:.1f}%. "
+        f"Overused words: {repeated}."
+    )
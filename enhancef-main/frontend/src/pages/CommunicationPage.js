@@ -26,6 +26,7 @@ export default function CommunicationPage() {
   const [interviewQuestions, setInterviewQuestions] = useState([]);
   const [currentQIndex, setCurrentQIndex] = useState(0);
   const [interviewTranscripts, setInterviewTranscripts] = useState({});
+  const [interviewDurations, setInterviewDurations] = useState({});
   const [interviewResults, setInterviewResults] = useState(null);
   const [evaluating, setEvaluating] = useState(false);
   const [loadingQuestions, setLoadingQuestions] = useState(false);
@@ -35,6 +36,7 @@ export default function CommunicationPage() {
   const videoRef = useRef(null);
   const streamRef = useRef(null);
   const recordStartRef = useRef(null);
+  const recordDurationRef = useRef(0);
 
   // Camera
   const startCamera = useCallback(async () => {
@@ -106,6 +108,8 @@ export default function CommunicationPage() {
     if (recognitionRef.current) {
       recognitionRef.current.stop();
       recognitionRef.current = null;
+      // Length of the recording behind the current transcript, sent so the server can measure pace
+      recordDurationRef.current = (Date.now() - recordStartRef.current) / 1000;
     }
     setRecording(false);
   }, []);
@@ -150,6 +154,8 @@ export default function CommunicationPage() {
     setView("interview");
     setCurrentQIndex(0);
     setInterviewTranscripts({});
+    setInterviewDurations({});
+    recordDurationRef.current = 0;
     setInterviewResults(null);
     setTranscript("");
     setFillerCount(0);
@@ -177,6 +183,8 @@ export default function CommunicationPage() {
   const saveTranscriptAndNext = () => {
     stopRecording();
     setInterviewTranscripts(prev => ({ ...prev, [currentQIndex]: transcript }));
+    setInterviewDurations(prev => ({ ...prev, [currentQIndex]: recordDurationRef.current }));
+    recordDurationRef.current = 0;
     setTranscript("");
     setFillerCount(0);
     setWpm(0);
@@ -188,6 +196,7 @@ export default function CommunicationPage() {
   const submitInterview = async () => {
     stopRecording();
     const allTranscripts = { ...interviewTranscripts, [currentQIndex]: transcript };
+    const allDurations = { ...interviewDurations, [currentQIndex]: recordDurationRef.current };
     setEvaluating(true);
     try {
       const results = [];
@@ -200,6 +209,7 @@ export default function CommunicationPage() {
             transcript: t,
             filler_words: fillerCount,
             speech_speed: `${wpm} WPM`,
+            duration_seconds: allDurations[i] || undefined,
           });
           // Parse AI evaluation immediately so it's ready for display
           const rawEval = res.data.evaluation;
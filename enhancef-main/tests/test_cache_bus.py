@@ -0,0 +1,171 @@
+import asyncio
+import cache_bus
+from cache_bus import InvalidationBus, UserCache, CHANGE_STREAM_HISTORY_LOST, CHANGE_STREAM_UNSUPPORTED
+from pymongo.errors import OperationFailure
+
+# Bus with the stream / poll loops replaced by scripted stand-ins; only run()'s fallback logic is real.
+
+def make_bus(watch_error=None, poll_error=None):
+    cache = UserCache()
+    cache.set("u1", "version", 3)
+    bus = InvalidationBus(db=None, cache=cache, mode="auto")
+    calls = []
+
+    async def watch():
+        calls.append("watch")
+        if watch_error:
+            raise watch_error
+
+    async def poll():
+        calls.append("poll")
+        if poll_error:
+            raise poll_error
+
+    bus._watch, bus._poll = watch, poll
+    return bus, cache, calls
+
+
+def test_standalone_mongo_falls_back_to_polling():
+    bus, cache, calls = make_bus(OperationFailure("no replica set", code=CHANGE_STREAM_UNSUPPORTED))
+    asyncio.run(bus.run())
+    assert calls == ["watch", "poll"]
+    assert cache.enabled
+
+
+def test_other_stream_failures_are_logged_and_fall_back_to_polling(caplog):
+    bus, cache, calls = make_bus(OperationFailure("not authorized", code=13))
+    asyncio.run(bus.run())
+    assert calls == ["watch", "poll"]
+    assert "not authorized" in caplog.text
+    assert cache.get("u1", "version") is None  # possibly missed events: nothing cached survives
+
+
+def test_cache_disabled_when_polling_dies(caplog):
+    bus, cache, calls = make_bus(OperationFailure("denied", code=13), poll_error=RuntimeError("boom"))
+    asyncio.run(bus.run())
+    assert not cache.enabled
+    assert bus.snapshot()["mode"] == "off"
+    assert "disabling the per-user cache" in caplog.text
+    cache.set("u1", "version", 4)
+    assert cache.get("u1", "version") is None
+
+
+class FakeStream:
+    def __init__(self, events):
+        self.events = events
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.events:
+            raise asyncio.CancelledError
+        event = self.events.pop(0)
+        self.resume_token = {"_data": event["fullDocument"]["userId"]}
+        return event
+
+
+class FakeCollection:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def watch(self, pipeline, full_document=None, resume_after=None):
+        self.owner.resume_args.append(resume_after)
+        if resume_after is not None:
+            raise OperationFailure("resume point no longer in the oplog", code=CHANGE_STREAM_HISTORY_LOST)
+        return FakeStream([{"fullDocument": {"userId": "u1"}}])
+
+    async def find_one(self, query):
+        return self.owner.state
+
+    async def update_one(self, query, update, upsert=False):
+        self.owner.state = update["$set"]
+
+    async def delete_one(self, query):
+        self.owner.state = None
+
+
+class FakeDB:
+    def __init__(self, state):
+        self.state = state
+        self.resume_args = []
+        self.user_versions = self.cache_bus_state = FakeCollection(self)
+
+
+def test_lost_resume_token_restarts_stream_from_now():
+    db = FakeDB({"resumeToken": {"_data": "stale"}})
+    cache = UserCache()
+    cache.set("u1", "version", 3)
+    bus = InvalidationBus(db, cache, mode="auto")
+    try:
+        asyncio.run(bus._watch())
+    except asyncio.CancelledError:
+        pass
+    assert db.resume_args == [{"_data": "stale"}, None]
+    assert db.state is None  # stale token dropped
+    assert bus.events == 1 and cache.get("u1", "version") is None
+
+
+class FakeVersions:
+    def __init__(self):
+        self.docs = {}
+
+    def bump(self, user_id, updated_at):
+        version = self.docs.get(user_id, {}).get("version", 0) + 1
+        self.docs[user_id] = {"userId": user_id, "version": version, "updatedAt": updated_at}
+
+    def find(self, query, projection=None):
+        cutoff = query["updatedAt"]["$gte"]
+        docs = sorted((d for d in self.docs.values() if d["updatedAt"] >= cutoff), key=lambda d: d["updatedAt"])
+        return FakeCursor([dict(d) for d in docs])
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.docs:
+            raise StopAsyncIteration
+        return self.docs.pop(0)
+
+
+def test_poll_sees_skewed_and_same_millisecond_bumps(monkeypatch):
+    from datetime import datetime, timedelta, timezone
+    monkeypatch.setattr(cache_bus, "POLL_INTERVAL", 0)
+    versions = FakeVersions()
+    db = type("DB", (), {"user_versions": versions})()
+    cache = UserCache()
+    bus = InvalidationBus(db, cache, mode="poll")
+    stamp = datetime.now(timezone.utc) - timedelta(seconds=3)  # Mongo's clock runs 3 s behind ours
+
+    async def scenario():
+        task = asyncio.create_task(bus._poll())
+        await asyncio.sleep(0.01)
+        cache.set("u1", "version", 1)
+        versions.bump("u1", stamp)
+        await asyncio.sleep(0.01)
+        assert cache.get("u1", "version") is None  # seen despite predating our own start time
+        events = bus.events
+        await asyncio.sleep(0.01)
+        assert bus.events == events  # re-read in the overlap window but not re-observed
+        cache.set("u1", "version", 2)
+        versions.bump("u1", stamp)  # second bump in the same millisecond
+        await asyncio.sleep(0.01)
+        assert cache.get("u1", "version") is None
+        task.cancel()
+
+    asyncio.run(scenario())
@@ -0,0 +1,74 @@
+import asyncio
+import model_router
+from model_router import ModelRouter
+
+# Fake providers with injected latency / failures: {model: (delay_seconds, error_or_None)}
+
+def fake_provider(behaviour: dict, calls: list):
+    async def provider(model, system_msg, user_msg):
+        calls.append(model)
+        delay, error = behaviour[model]
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return f"reply from {model}"
+    return provider
+
+TASKS = {"chat": ["strong", "light"], "interview_questions": ["light", "strong"]}
+
+
+def test_routes_task_to_preferred_model():
+    calls = []
+    router = ModelRouter(fake_provider({"strong": (0, None), "light": (0, None)}, calls), TASKS)
+    assert asyncio.run(router.generate("interview_questions", "sys", "msg")) == "reply from light"
+    assert asyncio.run(router.generate("chat", "sys", "msg")) == "reply from strong"
+    assert calls == ["light", "strong"]
+
+
+def test_hedges_after_p95_and_cancels_loser(monkeypatch):
+    monkeypatch.setattr(model_router, "MIN_HEDGE_DELAY", 0.01)
+    calls = []
+    behaviour = {"strong": (0.02, None), "light": (0.0, None)}
+    router = ModelRouter(fake_provider(behaviour, calls), TASKS)
+
+    async def scenario():
+        for _ in range(model_router.MIN_SAMPLES):
+            await router.generate("chat", "sys", "msg")  # establishes a ~20ms p95 for "strong"
+        behaviour["strong"] = (5.0, None)  # tail latency spike
+        start = asyncio.get_running_loop().time()
+        reply = await router.generate("chat", "sys", "msg")
+        return reply, asyncio.get_running_loop().time() - start
+
+    reply, elapsed = asyncio.run(scenario())
+    assert reply == "reply from light"
+    assert elapsed < 1.0
+    # the cancelled slow call is not counted as a latency sample
+    assert router.stats["strong"].snapshot()["samples"] == model_router.MIN_SAMPLES
+
+
+def test_fails_over_on_error():
+    calls = []
+    router = ModelRouter(fake_provider({"strong": (0, RuntimeError("503")), "light": (0, None)}, calls), TASKS)
+    assert asyncio.run(router.generate("chat", "sys", "msg")) == "reply from light"
+    assert calls == ["strong", "light"]
+    assert router.stats["strong"].outcomes[-1] is True
+
+
+def test_demotes_model_with_high_error_rate():
+    calls = []
+    router = ModelRouter(fake_provider({"strong": (0, RuntimeError("quota")), "light": (0, None)}, calls), TASKS)
+    for _ in range(model_router.MIN_SAMPLES):
+        asyncio.run(router.generate("chat", "sys", "msg"))
+    calls.clear()
+    asyncio.run(router.generate("chat", "sys", "msg"))
+    assert calls == ["light"]
+
+
+def test_raises_when_all_models_fail():
+    router = ModelRouter(fake_provider({"strong": (0, RuntimeError("a")), "light": (0, RuntimeError("b"))}, []), TASKS)
+    try:
+        asyncio.run(router.generate("chat", "sys", "msg"))
+    except RuntimeError as e:
+        assert str(e) in ("a", "b")
+    else:
+        raise AssertionError("expected failure")
@@ -0,0 +1,73 @@
+import prompt_budget
+from prompt_budget import TokenCalibration, elide_runs, estimate_tokens, model_family
+
+NESTED_C = """int main() {
+    for (int i = 0; i < n; i++) {
+        for (int j = 0; j < n; j++) {
+            if (a[i][j]) {
+                while (k--) {
+                    if (b[k]) {
+                        if (c[k]) {
+                            x++;
+                        }
+                    }
+                }
+            }
+        }
+    }
+}"""
+
+
+def test_closing_braces_are_not_elided_as_data():
+    assert elide_runs(NESTED_C) == NESTED_C
+
+
+def test_data_rows_are_still_elided():
+    rows = "\n".join(f"    {{{i}, {i * 2}, {i * 3}}}," for i in range(20))
+    code = f"int table[][3] = {{\n{rows}\n}};"
+    compacted = elide_runs(code)
+    assert "similar data lines elided" in compacted
+    assert compacted.splitlines()[-1] == "};"
+
+
+def test_ratios_differ_by_family_and_for_code():
+    text = "x" * 1000
+    assert model_family("gpt-4o-mini") == "gpt-4o"
+    assert model_family("gpt-4-turbo") == "gpt"
+    assert model_family("mistral-large") == "default"
+    assert estimate_tokens(text, "gemini-2.5-flash") == 251
+    assert estimate_tokens(text, "gemini-2.5-flash", code=True) == 313
+    assert estimate_tokens(text, "mistral-large") > estimate_tokens(text, "gemini-2.5-flash")
+
+
+def test_calibration_converges_on_reported_counts(monkeypatch):
+    calibration = TokenCalibration(alpha=0.5)
+    monkeypatch.setattr(prompt_budget, "token_calibration", calibration)
+    text = "word " * 200  # 1000 chars: ratio estimate 250 tokens for gemini
+    for _ in range(10):
+        calibration.observe("gemini-2.5-flash", text, 200)
+    assert abs(calibration.factor("gemini-2.5-flash") - 0.8) < 0.01
+    assert abs(estimate_tokens(text, "gemini-2.5-flash") - 200) <= 1
+    assert calibration.factor("gemini-2.5-flash-lite") == 1.0  # per model
+
+
+def test_offloaded_compaction_uses_the_callers_calibration(monkeypatch):
+    import asyncio
+    import cpu_tasks
+    from executors import executors
+    calibration = TokenCalibration()
+    calibration.factors["gemini-2.5-flash"] = 2.0  # learned in this process only
+    monkeypatch.setattr(prompt_budget, "token_calibration", calibration)
+    code = "\n".join(f"int value_{i} = compute(value_{i - 1}, {i});" for i in range(800))  # ~30 KB: offloaded
+    factor = calibration.factor("gemini-2.5-flash")
+
+    async def compact():
+        try:
+            return await cpu_tasks.compact_prompt_code(code, "c", 6000, "gemini-2.5-flash", factor)
+        finally:
+            executors.shutdown()
+
+    compacted = asyncio.run(compact())
+    assert executors.calls["compact_prompt_code"]["offloaded"] >= 1
+    assert estimate_tokens(compacted, "gemini-2.5-flash", code=True) <= 6000
+    assert compacted == prompt_budget.compact_code(code, "c", 6000, "gemini-2.5-flash")  # same as inline
@@ -0,0 +1,134 @@
+import asyncio
+import pytest
+import rate_limit
+from rate_limit import RateLimiter, RateLimitExceeded, TokenBucket
+
+LIMITS = {"chat": (2, 60)}  # burst of 2, one token per second
+
+
+class Clock:
+    def __init__(self, t=0.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+def make_limiter(mode="local", db=None, budget=1000):
+    clock, wall = Clock(), Clock(1_700_000_000.0)
+    limiter = RateLimiter(db, mode=mode, limits=LIMITS, daily_token_budget=budget, clock=clock, wall_clock=wall)
+    return limiter, clock, wall
+
+
+def test_token_bucket_burst_then_refill():
+    bucket = TokenBucket(2, 60, now=0)
+    assert bucket.take(0) == 0 and bucket.take(0) == 0
+    assert bucket.take(0) == pytest.approx(1.0)  # empty: next token in one second
+    assert bucket.take(0.5) == pytest.approx(0.5)
+    assert bucket.take(1.0) == 0
+    assert bucket.take(100) == 0 and bucket.tokens == 1  # refill is capped at capacity
+
+
+def test_limits_per_identity_and_reports_retry_after():
+    limiter, clock, _ = make_limiter()
+    limiter.check("ip:a", "chat")
+    limiter.check("ip:a", "chat")
+    with pytest.raises(RateLimitExceeded) as exc:
+        limiter.check("ip:a", "chat")
+    assert exc.value.retry_after == pytest.approx(1.0)
+    limiter.check("ip:b", "chat")  # separate bucket
+    clock.t = 1.0
+    limiter.check("ip:a", "chat")
+
+
+def test_daily_token_budget():
+    limiter, _, wall = make_limiter(budget=100)
+    limiter.record_tokens("ip:a", 100)
+    with pytest.raises(RateLimitExceeded, match="budget") as exc:
+        limiter.check("ip:a", "chat")
+    assert 0 < exc.value.retry_after <= 86400
+    wall.t += 86400  # next UTC day
+    limiter.check("ip:a", "chat")
+
+
+def test_scale_multiplies_limits_and_budget():
+    limiter, _, _ = make_limiter(budget=100)
+    for _ in range(6):
+        limiter.check("ip:campus", "chat", scale=3)  # shared IP: three users' worth of burst
+    with pytest.raises(RateLimitExceeded):
+        limiter.check("ip:campus", "chat", scale=3)
+    limiter.record_tokens("ip:campus", 150)
+    with pytest.raises(RateLimitExceeded, match="budget"):
+        limiter.check("ip:campus", "chat", scale=1)
+    limiter.record_tokens("ip:other", 150)
+    limiter.check("ip:other", "chat", scale=2)
+
+
+def test_local_mode_memory_tracks_active_clients_only():
+    limiter, clock, _ = make_limiter(budget=100)
+    for i in range(1000):
+        limiter.check(f"ip:{i}", "chat")
+    assert len(limiter.used_tokens) == 0  # checks never create token entries
+    assert len(limiter.buckets) == 1000
+    clock.t = rate_limit.PRUNE_INTERVAL
+    limiter.check("ip:new", "chat")
+    assert list(limiter.buckets) == [("ip:new", "chat")]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            doc = next((d for d in self.docs if all(d.get(k) == v for k, v in op._filter.items())), None)
+            if doc is None:
+                doc = dict(op._filter)
+                self.docs.append(doc)
+            for field, n in op._doc["$inc"].items():
+                doc[field] = doc.get(field, 0) + n
+            doc.update(op._doc["$set"])
+
+    def find(self, query):
+        async def gen():
+            for d in self.docs:
+                if d["identity"] in query["identity"]["$in"] and all(d[k] == v for k, v in query.items() if k != "identity"):
+                    yield d
+        return gen()
+
+
+class FakeDB:
+    def __init__(self):
+        self.rate_limits = FakeCollection()
+        self.llm_usage = FakeCollection()
+
+
+def test_flush_shares_counters_across_workers():
+    db = FakeDB()
+    a, _, _ = make_limiter("mongo", db, budget=150)
+    b, _, _ = make_limiter("mongo", db, budget=150)
+    # Cluster-wide per-minute window is capacity + per_minute = 62 requests
+    a.limits = b.limits = {"chat": (40, 22)}
+
+    for _ in range(40):
+        a.check("ip:x", "chat")
+    a.record_tokens("ip:x", 60)
+    asyncio.run(a.flush())
+    assert db.rate_limits.docs[0]["count"] == 40
+    assert db.llm_usage.docs[0]["tokens"] == 60
+    assert not a.pending_requests and not a.pending_tokens
+
+    for _ in range(22):
+        b.check("ip:x", "chat")
+    b.record_tokens("ip:x", 50)
+    asyncio.run(b.flush())  # pulls back a's 40 requests and 60 tokens
+    assert db.rate_limits.docs[0]["count"] == 62
+    with pytest.raises(RateLimitExceeded, match="Too many"):
+        b.check("ip:x", "chat")
+    assert b.buckets[("ip:x", "chat")].tokens == pytest.approx(18)  # rejected request refunded locally
+
+    a.record_tokens("ip:x", 45)
+    asyncio.run(a.flush())
+    assert a.used_tokens[("ip:x", a._day())] == 155  # a's 105 plus b's 50
+    with pytest.raises(RateLimitExceeded, match="budget"):
+        a.check("ip:x", "chat")
@@ -0,0 +1,28 @@
+import pytest
+from skill_scoring import HISTORY_WINDOW, ScoreHistory, score_histories, topic_key, topic_name
+
+
+def test_topic_keys_round_trip_reserved_characters():
+    for topic in ["Data Interpretation", "Ratio v2.1", "$pecial"]:
+        key = topic_key(topic)
+        assert "." not in key and not key.startswith("$")
+        assert topic_name(key) == topic
+
+
+def test_scores_capped_document_with_running_totals():
+    doc = {
+        "userId": "u",
+        "coding": {"scores": [50.0] * HISTORY_WINDOW, "ts": list(range(HISTORY_WINDOW)), "count": 3000},
+        "aptitude": {
+            "scores": [80.0, 40.0], "ts": [1, 2], "count": 7,
+            "topicSums": {topic_key("v2.1"): 300.0, "Logical": 40.0},
+            "topicCounts": {topic_key("v2.1"): 6, "Logical": 1},
+        },
+    }
+    result = score_histories([ScoreHistory.from_document(doc), ScoreHistory.from_document({"userId": "empty"})])
+    assert result[0]["coding"] == {"ewma": 50.0, "trend": 0.0, "attempts": 3000}
+    assert result[0]["aptitude"]["attempts"] == 7
+    assert result[0]["aptitude"]["trend"] == pytest.approx(-40.0)
+    assert result[0]["topicAccuracy"] == {"v2.1": 50.0, "Logical": 40.0}
+    assert result[0]["communication"]["attempts"] == 0
+    assert result[1]["topicAccuracy"] == {} and result[1]["coding"]["attempts"] == 0
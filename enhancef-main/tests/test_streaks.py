@@ -0,0 +1,48 @@
+import random
+import pytest
+import streaks
+
+
+def test_advance_counts_consecutive_days_and_ignores_older_activity():
+    state = streaks.empty_state()
+    for day in (10, 11, 11, 12, 9, 15, 16):
+        state = streaks.advance(state, day)
+    assert state == {"current_streak": 2, "max_streak": 3, "last_active_day": 16}
+    assert streaks.recompute([16, 9, 12, 11, 10, 15, 11]) == streaks.recompute([9, 10, 11, 12, 15, 16])
+
+
+def test_update_pipeline_matches_advance():
+    mongomock = pytest.importorskip("mongomock")
+    collection = mongomock.MongoClient().db.streaks
+    rng = random.Random(7)
+    for user in range(50):
+        state = streaks.empty_state()
+        day = 1000
+        for _ in range(rng.randint(1, 25)):
+            day += rng.choice([-3, -1, 0, 0, 1, 1, 1, 2, 5])
+            if rng.random() < 0.1:
+                # a reset_streak.py pass zeroes a lapsed streak between writes
+                state = {**state, "current_streak": streaks.normalize(state, day)["current_streak"]}
+                collection.update_one({"userId": user}, {"$set": {"current_streak": state["current_streak"]}})
+            state = streaks.advance(state, day)
+            collection.update_one({"userId": user}, streaks.update_pipeline(day), upsert=True)
+            stored = collection.find_one({"userId": user}, {"_id": 0, "userId": 0})
+            assert stored == state, (user, day)
+
+
+def test_reset_and_recompute_agree_on_lapsed_streaks():
+    raw = streaks.recompute([100, 101, 102])
+    reset = {**raw, "current_streak": streaks.normalize(raw, 110)["current_streak"]}  # what reset_streak.py stores
+    assert reset["current_streak"] == 0
+    assert streaks.normalize(reset, 110) == streaks.normalize(raw, 110)
+    assert streaks.normalize(raw, 103)["current_streak"] == 3  # still alive the day after
+
+
+def test_merge_and_covers():
+    raw = streaks.recompute([1, 2, 3, 4, 5])      # older, longer run
+    legacy = streaks.recompute([20, 21])          # more recent activity from another source
+    merged = streaks.merge(raw, legacy)
+    assert merged == {"current_streak": 2, "max_streak": 5, "last_active_day": 21}
+    assert streaks.merge(legacy, raw) == merged
+    assert streaks.covers(merged, raw) and streaks.covers(merged, legacy)
+    assert not streaks.covers(legacy, raw)